@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+loadtest.py
+
+Load generator for taj.py (verification bot) and tr.py (training bot). Simulated users drive
+Application.process_update with synthetic Updates (CAPTCHA, menu navigation, verifications,
+registration and quiz answers) against a fake Bot API, with upstream sites served by the
+upstream_replay.py stand-in server, so nothing leaves the machine.
+
+Reported: p50/p95/p99 handler latency per step (queueing behind the update dispatcher
+included), event-loop lag, and process memory growth per 1k users.
+
+Examples:
+    python loadtest.py taj --users 2000 --concurrency 200 --fixtures upstream_fixtures --cases cases.csv
+    python loadtest.py tr --users 1000 --concurrency 100 --concurrent-updates 8
+
+The bots write their runtime files (DB, certificates, FSSC mirror) relative to the working
+directory, so the run happens in a scratch directory (--workdir, default: a new temp dir).
+Handlers registered with block=False (bulk upload, inline queries) are not measured.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import importlib
+import itertools
+import tempfile
+import tracemalloc
+from collections import Counter
+from typing import Optional, Dict, Any, List, Tuple
+
+from telegram import Update
+from telegram.ext import Application, ApplicationBuilder
+from telegram.request import BaseRequest, RequestData
+
+logger = logging.getLogger("loadtest")
+
+# ---------------- CONFIG ----------------
+FAKE_TOKEN = "123456:LOADTEST"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "LoadTestBot", "username": "loadtest_bot"}
+FIRST_USER_ID = 10_000_000
+LAG_INTERVAL = 0.05           # event-loop lag probe period (s)
+MEMORY_CHECKPOINT_USERS = 1000
+# Bot API methods answered with a Message object (everything else returns True)
+MESSAGE_METHODS = {"sendMessage", "editMessageText", "editMessageReplyMarkup", "sendDocument", "sendPhoto"}
+
+# ---------------- fake Bot API ----------------
+class FakeBotAPI(BaseRequest):
+    """Answers Bot API calls locally with minimal valid results, after an optional delay."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None, **_) -> Tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        await asyncio.sleep(self.latency)  # always yield, like a real network round trip
+        params = request_data.parameters if request_data else {}
+        if endpoint == "getMe":
+            result: Any = BOT_USER
+        elif endpoint in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id") or 0)
+            result = {"message_id": next(self._message_ids), "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER, "text": str(params.get("text") or "")}
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+# ---------------- measurements ----------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[idx]
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    v = sorted(values)
+    return {
+        "count": len(v),
+        "p50_ms": round(percentile(v, 50) * 1000, 2),
+        "p95_ms": round(percentile(v, 95) * 1000, 2),
+        "p99_ms": round(percentile(v, 99) * 1000, 2),
+        "max_ms": round(v[-1] * 1000, 2) if v else 0.0,
+    }
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+async def loop_lag_probe(samples: List[float], stop: asyncio.Event) -> None:
+    """Sleep LAG_INTERVAL repeatedly; the overshoot is time the loop was busy elsewhere."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        t0 = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        samples.append(max(0.0, loop.time() - t0 - LAG_INTERVAL))
+
+# ---------------- simulated users ----------------
+class VirtualUser:
+    """One Telegram user sending messages / pressing buttons; every update is timed."""
+
+    _update_ids = itertools.count(1)
+
+    def __init__(self, harness: "LoadHarness", user_id: int):
+        self.h = harness
+        self.id = user_id
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}", "language_code": "en"}
+        self.chat = {"id": user_id, "type": "private"}
+        self._message_ids = itertools.count(1)
+
+    @property
+    def user_data(self) -> Dict[str, Any]:
+        return self.h.app.user_data[self.id]
+
+    async def _send(self, label: str, payload: Dict[str, Any]) -> None:
+        update = Update.de_json({"update_id": next(self._update_ids), **payload}, self.h.app.bot)
+        await self.h.dispatch(label, update)
+        if self.h.think:
+            await asyncio.sleep(random.uniform(0, self.h.think))
+
+    async def text(self, text: str, label: Optional[str] = None) -> None:
+        msg = {"message_id": next(self._message_ids), "date": int(time.time()), "chat": self.chat, "from": self.user, "text": text}
+        if text.startswith("/"):
+            cmd = text.split()[0]
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(cmd)}]
+            label = label or cmd
+        await self._send(label or "text", {"message": msg})
+
+    async def click(self, data: str, label: Optional[str] = None) -> None:
+        msg = {"message_id": next(self._message_ids), "date": int(time.time()), "chat": self.chat, "from": BOT_USER, "text": "…"}
+        query = {"id": str(next(self._update_ids)), "from": self.user, "chat_instance": str(self.id), "data": data, "message": msg}
+        await self._send(label or f"cb:{data.split(':')[0].split('|')[0]}", {"callback_query": query})
+
+    async def solve_captcha(self) -> None:
+        await self.text("/start")
+        # taj.py keeps it on the Conversation in user_data["conv"], tr.py in user_data itself
+        conv = self.user_data.get("conv")
+        answer = conv.captcha_answer if conv is not None else self.user_data.get("captcha_answer")
+        await self.text(str(answer or "0"), label="captcha")
+
+# ---------- taj.py scenarios ----------
+def _cert(h: "LoadHarness", cb: str) -> Tuple[str, ...]:
+    pool = h.cases.get(cb)
+    return random.choice(pool) if pool else (cb, f"LT-{random.randint(1, 10**6)}")
+
+async def taj_fssc_coid(u: VirtualUser) -> None:
+    await u.solve_captcha()
+    await u.click("main:check")
+    await u.click("type:fssc")
+    await u.click("fssc:22000")
+    await u.click("fssc_method:22000:coid")
+    await u.text(_cert(u.h, "fssc")[1], label="verify:fssc")
+
+async def taj_cb_verify(u: VirtualUser) -> None:
+    cb = random.choice(["qsi", "infinity"])
+    await u.solve_captcha()
+    await u.click("main:check")
+    await u.click("type:iso")
+    await u.click(f"cb:{cb}")
+    await u.text(_cert(u.h, cb)[1], label=f"verify:{cb}")
+
+async def taj_verify_command(u: VirtualUser) -> None:
+    await u.solve_captcha()
+    case = _cert(u.h, "fssc")
+    await u.text(f"/verify fssc {case[1]}")
+
+async def taj_browse(u: VirtualUser) -> None:
+    await u.solve_captcha()
+    for data in ("main:contact", "main:address", "main:request", "main:menu"):
+        await u.click(data)
+
+TAJ_SCENARIOS = [(taj_fssc_coid, 0.4), (taj_cb_verify, 0.3), (taj_verify_command, 0.15), (taj_browse, 0.15)]
+
+# ---------- tr.py scenarios ----------
+async def _tr_answer_quiz(u: VirtualUser) -> None:
+    while True:
+        quiz = u.user_data.get("quiz")
+        if not quiz or quiz["index"] >= len(quiz["questions"]):
+            return
+        await u.click(f"ans|{quiz['questions'][quiz['index']]['a_idx']}", label="quiz:answer")
+
+async def tr_register_and_quiz(u: VirtualUser) -> None:
+    await u.solve_captcha()
+    await u.click("lang_en")
+    await u.click("menu_register")
+    idx = random.randrange(len(u.h.module.TRAININGS))
+    await u.click(f"train|{idx}")
+    for value in ("ALI", "AHMADI", "QA MANAGER", "ACME FOODS", "2024-01-01"):
+        await u.text(value, label="registration")
+    await u.click("reg_confirm")
+    await u.click("start_pre")
+    await _tr_answer_quiz(u)
+    await u.click("start_post")
+    training = u.h.module.TRAININGS[idx]
+    await u.text((u.h.module.VALID_SERIALS.get(training) or ["0"])[0], label="serial")
+    await _tr_answer_quiz(u)
+
+async def tr_check_certificate(u: VirtualUser) -> None:
+    await u.solve_captcha()
+    await u.click("lang_en")
+    await u.click("menu_check")
+    await u.text(f"LT{random.randint(1, 10**6):06d}", label="check")
+
+TR_SCENARIOS = [(tr_register_and_quiz, 0.7), (tr_check_certificate, 0.3)]
+
+# ---------------- harness ----------------
+class LoadHarness:
+    def __init__(self, module, app: Application, fake_api: FakeBotAPI, scenarios, think: float = 0.0,
+                 cases: Optional[Dict[str, List[Tuple[str, ...]]]] = None):
+        self.module = module
+        self.app = app
+        self.fake_api = fake_api
+        self.scenarios = scenarios
+        self.think = think
+        self.cases = cases or {}
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Counter = Counter()
+        # like the polling fetcher: at most concurrent_updates updates are handled at once
+        self._dispatch_sem = asyncio.Semaphore(max(1, app.concurrent_updates))
+
+    async def dispatch(self, label: str, update: Update) -> None:
+        t0 = time.perf_counter()
+        async with self._dispatch_sem:
+            try:
+                await self.app.process_update(update)
+            except Exception as e:
+                self.errors[f"{label}: {type(e).__name__}"] += 1
+        self.latencies.setdefault(label, []).append(time.perf_counter() - t0)
+
+    async def run_user(self, user_id: int) -> None:
+        funcs, weights = zip(*self.scenarios)
+        scenario = random.choices(funcs, weights)[0]
+        try:
+            await scenario(VirtualUser(self, user_id))
+        except Exception as e:
+            logger.exception("user %s (%s) failed", user_id, scenario.__name__)
+            self.errors[f"{scenario.__name__}: {type(e).__name__}"] += 1
+
+    async def run(self, users: int, concurrency: int) -> Dict[str, Any]:
+        lag: List[float] = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(loop_lag_probe(lag, stop))
+        sem = asyncio.Semaphore(concurrency)
+        done = 0
+        checkpoints = [(0, rss_bytes())]
+
+        async def one(i: int) -> None:
+            nonlocal done
+            async with sem:
+                await self.run_user(FIRST_USER_ID + i)
+            done += 1
+            if done % MEMORY_CHECKPOINT_USERS == 0:
+                checkpoints.append((done, rss_bytes()))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(users)))
+        wall = time.perf_counter() - t0
+        stop.set()
+        await probe
+        if checkpoints[-1][0] != users:
+            checkpoints.append((users, rss_bytes()))
+
+        all_latencies = [x for v in self.latencies.values() for x in v]
+        growth = (checkpoints[-1][1] - checkpoints[0][1]) / max(users / 1000.0, 1e-9)
+        return {
+            "users": users,
+            "concurrency": concurrency,
+            "wall_s": round(wall, 2),
+            "updates": len(all_latencies),
+            "updates_per_s": round(len(all_latencies) / wall, 1) if wall else 0.0,
+            "latency": {"all": summarize(all_latencies), **{k: summarize(v) for k, v in sorted(self.latencies.items())}},
+            "loop_lag": summarize(lag),
+            "memory": {
+                "rss_start_mb": round(checkpoints[0][1] / 2**20, 1),
+                "rss_end_mb": round(checkpoints[-1][1] / 2**20, 1),
+                "growth_per_1k_users_mb": round(growth / 2**20, 2),
+                "checkpoints_mb": [(n, round(b / 2**20, 1)) for n, b in checkpoints],
+                "user_data_entries": len(self.app.user_data),
+            },
+            "bot_api_calls": dict(self.fake_api.calls),
+            "errors": dict(self.errors),
+        }
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['users']} users, concurrency {report['concurrency']}: {report['updates']} updates "
+          f"in {report['wall_s']} s ({report['updates_per_s']} updates/s)")
+    print(f"{'step':<24}{'count':>8}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}{'max_ms':>10}")
+    for label, s in report["latency"].items():
+        print(f"{label:<24}{s['count']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+    lag = report["loop_lag"]
+    print(f"event-loop lag: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+    mem = report["memory"]
+    print(f"memory: {mem['rss_start_mb']} -> {mem['rss_end_mb']} MB RSS, {mem['growth_per_1k_users_mb']} MB per 1k users")
+    if "tracemalloc_top" in report:
+        for line in report["tracemalloc_top"]:
+            print(f"  {line}")
+    if report["errors"]:
+        print(f"errors: {report['errors']}")
+
+# ---------------- CLI ----------------
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    module = importlib.import_module(args.bot)
+    cases: Dict[str, List[Tuple[str, ...]]] = {}
+    server = None
+    if args.bot == "taj":
+        import upstream_replay
+        store = upstream_replay.FixtureStore(args.fixtures)
+        store.load()
+        server = upstream_replay.StandInServer(store, latency=args.upstream_latency, jitter=args.upstream_jitter,
+                                               error_rate=args.upstream_error_rate)
+        server.start()
+        upstream_replay.install_standin(server.base_url, rate_limits=args.upstream_rate_limits)
+        if args.cases:
+            for case in upstream_replay.load_cases(args.cases):
+                cases.setdefault(case[0], []).append(case)
+
+    fake_api = FakeBotAPI(args.bot_latency)
+    builder = (ApplicationBuilder().token(FAKE_TOKEN).request(fake_api).get_updates_request(FakeBotAPI())
+               .updater(None).concurrent_updates(args.concurrent_updates or False))
+    app = module.build_application(builder)
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    harness = LoadHarness(module, app, fake_api, TAJ_SCENARIOS if args.bot == "taj" else TR_SCENARIOS,
+                          think=args.think, cases=cases)
+    try:
+        report = await harness.run(args.users, args.concurrency)
+    finally:
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+        await app.shutdown()
+        if server:
+            server.shutdown()
+            report_server = dict(server.stats)
+    if server:
+        report["upstream"] = report_server
+    return report
+
+def cli(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Simulated-user load test for taj.py / tr.py")
+    parser.add_argument("bot", choices=["taj", "tr"])
+    parser.add_argument("-u", "--users", type=int, default=1000, help="simulated users in total")
+    parser.add_argument("-c", "--concurrency", type=int, default=100, help="users active at the same time")
+    parser.add_argument("--think", type=float, default=0.0, help="max random pause between a user's steps (s)")
+    parser.add_argument("--concurrent-updates", type=int, default=0, help="Application.concurrent_updates (0: sequential, as deployed)")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="simulated Bot API round trip (s)")
+    parser.add_argument("--fixtures", default=os.path.abspath("upstream_fixtures"), help="upstream_replay fixture directory (taj)")
+    parser.add_argument("--cases", default=None, help="upstream_replay cases CSV with certificate numbers to verify (taj)")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="stand-in server delay (s)")
+    parser.add_argument("--upstream-jitter", type=float, default=0.1, help="stand-in server extra random delay (s)")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="fraction of upstream requests failing")
+    parser.add_argument("--upstream-rate-limits", action="store_true", help="keep taj.py's per-host rate limits (default: lifted)")
+    parser.add_argument("--workdir", default=None, help="scratch directory for the bot's files (default: new temp dir)")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the top Python allocation sites")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the bots' logging (INFO and up)")
+    args = parser.parse_args(argv)
+
+    if args.cases:
+        args.cases = os.path.abspath(args.cases)
+    args.fixtures = os.path.abspath(args.fixtures)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    workdir = args.workdir or tempfile.mkdtemp(prefix=f"{args.bot}-loadtest-")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    random.seed(args.seed)
+    # synthetic certificate numbers make the fetchers log errors by design; keep the report readable
+    level = logging.INFO if args.verbose else logging.CRITICAL
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=level)
+    logging.getLogger().setLevel(level)
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    report = asyncio.run(_main(args))
+    report["workdir"] = workdir
+    if args.tracemalloc:
+        top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+        report["tracemalloc_top"] = [str(s) for s in top]
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])
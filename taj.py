@@ -13,27 +13,57 @@ an additional certification-body (callback cb:sisbel).
 Added:
 - Request Certification submenu (buttons linking to Application_Form.php)
 - FSSC flow: choose FSSC 22000 / 24000 -> Verify by COID or Verify by Company Name.
-- find_coid_by_company_name() helper to resolve COID from FSSC public-register search HTML.
+- resolve_fssc_company() helper to resolve COID from FSSC public-register search HTML.
 """
 
+import os
+import json
 import logging
 import asyncio
 import html
+import hashlib
+import math
 import re
 import random
-from typing import Optional, Dict, Any, Tuple
+import threading
+import unicodedata
+import csv
+import io
+import time
+import sys
+import functools
+import traceback
+import contextvars
+import copy
+import enum
+import email.utils
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, replace
+from collections import Counter
+from typing import Optional, Dict, Any, Tuple, List, Callable, Set
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, parse_qs
 from bs4 import BeautifulSoup
+from lxml import etree
 from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    Message,
     Update,
 )
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CommandHandler,
     CallbackQueryHandler,
+    InlineQueryHandler,
     MessageHandler,
     ContextTypes,
     filters,
@@ -52,6 +82,111 @@ QRO_ORG_PAGE = "https://qrocert.org/verify.aspx"
 QSI_BASE = "http://certificate.qsicert.ca/QSICERT?ID="
 SISBEL_API_URL = "https://q.sisbel.com/api/belge-sorgula.php"  # SISBEL API added
 
+# Runtime cache lifetime for fetched certificates / verification results
+CACHE_TTL = 6 * 3600
+
+# Hot-certificate refresh (JobQueue): re-fetch the most requested entries before they expire
+REFRESH_INTERVAL = 300              # seconds between refresh runs
+REFRESH_TOP_N = 20                  # hottest keys considered per run
+REFRESH_AHEAD = 900                 # refresh entries expiring within this many seconds
+REFRESH_RATE = 1.0                  # max upstream refreshes per second
+ACCESS_TRACK_MAX = 5000             # tracked keys kept after decay
+
+# Negative cache for FSSC / Infinity / QSI: an identifier the upstream did not know is answered
+# "not found" locally for NEGATIVE_TTL; one that misses again within MISS_WINDOW (remembered
+# in a per-body rotating Bloom filter) is kept for NEGATIVE_TTL_REPEAT
+NEGATIVE_TTL = 300
+NEGATIVE_TTL_REPEAT = 3600
+MISS_WINDOW = 3600
+MISS_FILTER_CAPACITY = 50000        # identifiers per Bloom generation
+MISS_FILTER_FP_RATE = 0.001
+
+# Stale-while-revalidate: the last good result per certificate is kept this long and answered
+# (with its "checked at" time) when the live check is slower than STALE_GRACE or fails
+STALE_MAX_AGE = 7 * 24 * 3600
+STALE_GRACE = 3.0                   # seconds to wait for the live check before answering stale
+# FSSC / QSI pages: validators (ETag, Last-Modified), body hash and parsed result kept this long
+# for conditional GETs and for skipping the parse of an unchanged page
+PAGE_META_TTL = 7 * 24 * 3600
+# Streamed page fetch: stop reading once the section the parser needs has been closed (FSSC only;
+# the QSI parser reads the whole page)
+STREAM_FETCH = os.environ.get("TAJ_STREAM_FETCH", "1") != "0"
+STREAM_CHUNK = 16 * 1024
+
+# Local FSSC public-register mirror (company name -> COID without a live search)
+FSSC_MIRROR_FILE = "fssc_register_mirror.json"
+FSSC_MIRROR_MIN_SCORE = 0.8         # trigram score needed to answer a name lookup locally
+FSSC_FUZZY_THRESHOLD = 0.6          # minimum score for a near-match offered to the user
+FSSC_AMBIGUITY_MARGIN = 0.1         # lead over the runner-up needed to skip disambiguation
+FSSC_PICK_AGREEMENT = 2             # users picking the same COID for a name before it is answered for everyone
+FSSC_PICK_VOTES_MAX = 5000          # names with pending picks remembered (oldest dropped)
+FSSC_PICK_MAX = 5                   # candidates shown on the disambiguation keyboard
+FSSC_PREFETCH_TOP = 3               # candidate detail pages fetched while the user chooses
+FSSC_MIRROR_SAVE_INTERVAL = 600     # seconds between mirror saves
+FSSC_CRAWL_INTERVAL = 1800          # seconds between crawl runs
+FSSC_CRAWL_PER_RUN = 2              # search terms fetched per crawl run
+FSSC_CRAWL_DELAY = 5.0              # seconds between crawl requests
+# comma-separated seed search terms, cycled round-robin by the crawl job
+FSSC_CRAWL_TERMS = [t.strip() for t in os.environ.get("TAJ_FSSC_CRAWL_TERMS", ",".join("abcdefghijklmnopqrstuvwxyz")).split(",") if t.strip()]
+
+# Shared HTTP connection pool for the fetchers (keep-alive across lookups)
+HTTP_POOL_SIZE = 16
+
+# Outbound rate limits per upstream host: (requests per second, burst). Override / add hosts with
+# TAJ_RATE_LIMITS="www.fssc.com=1/3,qrocert.org=0.5/2". A 429 or 503 pauses the host for its
+# Retry-After (RETRY_AFTER_DEFAULT when absent, capped at RETRY_AFTER_MAX).
+UPSTREAM_RATE_LIMITS = {
+    "www.fssc.com": (2.0, 6),
+    "infinitycert.com": (2.0, 6),
+    "certificate.qsicert.ca": (1.0, 4),
+    "qrocert.com": (1.0, 3),
+    "qrocert.org": (1.0, 3),
+    "q.sisbel.com": (1.0, 3),
+}
+UPSTREAM_RATE_LIMITS.update({
+    host: (float(rate), int(burst))
+    for host, rate, burst in re.findall(r"([^=,\s]+)=([\d.]+)/(\d+)", os.environ.get("TAJ_RATE_LIMITS", ""))
+})
+# longest a request waits for its host before the lookup is answered "busy"
+RATE_LIMIT_MAX_WAIT = {"interactive": 10.0, "background": 120.0}
+RETRY_AFTER_DEFAULT = 30.0
+RETRY_AFTER_MAX = 900.0
+
+# Local HTTP verification API (disabled unless TAJ_API_PORT is set)
+API_HOST = os.environ.get("TAJ_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("TAJ_API_PORT", "0") or 0)
+API_KEY = os.environ.get("TAJ_API_KEY")  # if set, required in the X-API-Key header
+
+# Bulk verification (CSV upload)
+BULK_MAX_ROWS = 500
+BULK_CONCURRENCY = 8                # lookups in flight per upload (per-body limits: CertBody.bulk_limit)
+BULK_PROGRESS_INTERVAL = 2.0        # seconds between progress-message edits
+
+# Inline mode (@bot <body> <number> [date]); inline mode must be enabled in @BotFather
+INLINE_DEBOUNCE = 0.8               # wait for the user to stop typing before a cold upstream lookup
+INLINE_CACHE_TIME = 300             # seconds Telegram may cache a positive inline answer
+
+# Telegram user ids allowed to run admin commands (/stats), comma-separated
+ADMIN_IDS = {int(x) for x in os.environ.get("TAJ_ADMIN_IDS", "").split(",") if x.strip().isdigit()}
+
+# Latency histograms (seconds); exported on GET /metrics of the local API
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Default thread pool used by run_fetcher / asyncio.to_thread (sized explicitly so it can be watched)
+EXECUTOR_WORKERS = int(os.environ.get("TAJ_EXECUTOR_WORKERS", "0") or 0) or min(32, (os.cpu_count() or 1) + 4)
+# Per-certification-body fetch pools (sized by CertBody.workers / queue_limit, see CERT_BODIES), so one
+# slow upstream only exhausts its own workers. Lookups beyond workers + queue limit are refused at once.
+BULK_BUSY_RETRIES = 3               # bulk rows re-try a busy body this many times
+BULK_BUSY_BACKOFF = 2.0             # seconds, doubled per retry
+# HTML parser processes (BeautifulSoup is CPU-bound and holds the GIL); 0 = parse in the fetch thread.
+# Each is a full interpreter with telegram / bs4 / lxml loaded, and os.cpu_count() reports the host's
+# CPUs rather than the dyno's share, so the default is small; raise it with TAJ_PARSE_WORKERS.
+PARSE_WORKERS = int(os.environ.get("TAJ_PARSE_WORKERS", "") or 2)
+# Event-loop watchdog
+WATCHDOG_INTERVAL = 0.5             # seconds between loop heartbeats / executor samples
+WATCHDOG_STALL = 1.0                # loop blocked this long -> log the loop thread's stack
+WATCHDOG_STACK_COOLDOWN = 60.0      # at most one stack dump per this many seconds
+
 # ---------------- LOGGING ----------------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("cert_bot_qrocom_submit_mainmenu_with_sisbel")
@@ -116,14 +251,9 @@ def make_fssc_method_kb(standard: str) -> InlineKeyboardMarkup:
         ]
     )
 
-# certification-body keyboard builder function will include all CBs (qro_com, qro_org, qsi, infinity, fssc, sisbel, other)
+# certification-body keyboard: every body in CERT_BODIES with a button label, in registry order
 def make_cb_keyboard_for_type(ctype: str) -> InlineKeyboardMarkup:
-    kb = []
-    kb.append([InlineKeyboardButton("QRO | IAF", callback_data="cb:qro_org")])
-    kb.append([InlineKeyboardButton("QRO | UKAF", callback_data="cb:qro_com")])
-    kb.append([InlineKeyboardButton("QSI Cert Canada", callback_data="cb:qsi")])
-    kb.append([InlineKeyboardButton("Infinity ICI", callback_data="cb:infinity")])
-    kb.append([InlineKeyboardButton("SiSBEL", callback_data="cb:sisbel")])  # SISBEL option
+    kb = [[InlineKeyboardButton(b.label, callback_data=f"cb:{b.key}")] for b in CERT_BODIES.values() if b.label]
     kb.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="main:menu")])
     return InlineKeyboardMarkup(kb)
 
@@ -148,6 +278,8 @@ PROMPT_ISSUE_DATE_TEXT = (
 PROCESSING = "🔄 Processing your request — please wait while we securely fetch and verify your certificate data from the selected source. This may take a few moments depending on system response time."
 NOT_FOUND = "❌ No matching certificate record found in the selected source for the provided details."
 ERROR_MSG = "⚠️ An internal error occurred while processing your request. Please try again later or contact @jamshidiyan."
+BUSY_MSG = "⏳ The selected source is handling many requests right now. Please try again in a minute."
+STALE_NOTE = "🕒 <i>Last checked {checked} — the source is not responding right now, so this is the last verified result.</i>"
 THANK_YOU_BRIEF = "✅ Your verification has been successfully completed. Thank you for using TajCert Bot — your trusted assistant for professional certificate validation. For technical support or inquiries, please contact @jamshidiyan"
 
 # Office contact details (as requested)
@@ -157,14 +289,621 @@ OFFICE_ADDRESS = "Ferdowsi Road, Between Ferdowsi 11 & 13, House #73, 4th Floor,
 OFFICE_EMAIL = "info@taj-ra.com"
 REQUEST_CERT_LINK = "https://taj-ra.com/Application_Form.php"
 
+# ---------------- outbound rate limiting ----------------
+# Every upstream request waits for a token of its host's bucket (UPSTREAM_RATE_LIMITS). Lookups
+# run for a user are "interactive"; bulk uploads and the refresh / prefetch / crawl jobs run
+# under background_priority() and give way to waiting interactive requests.
+UPSTREAM_HOST_CB = {
+    "www.fssc.com": "fssc",
+    "infinitycert.com": "infinity",
+    "certificate.qsicert.ca": "qsi",
+    "qrocert.com": "qro_com",
+    "qrocert.org": "qro_org",
+    "q.sisbel.com": "sisbel",
+}
+
+request_priority: contextvars.ContextVar[str] = contextvars.ContextVar("taj_request_priority", default="interactive")
+
+@contextmanager
+def background_priority():
+    token = request_priority.set("background")
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+def parse_retry_after(value: Optional[str]) -> float:
+    """Retry-After (seconds or HTTP date) -> seconds to pause, within [1, RETRY_AFTER_MAX]."""
+    if not value:
+        return RETRY_AFTER_DEFAULT
+    try:
+        secs = float(value)
+    except ValueError:
+        try:
+            secs = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            secs = RETRY_AFTER_DEFAULT
+    return min(RETRY_AFTER_MAX, max(1.0, secs))
+
+class HostScheduler:
+    """
+    Token bucket per host shared by all fetch threads. acquire() blocks the calling thread
+    until the host may be called (interactive waiters first) and raises UpstreamRateLimited
+    when that would take longer than max_wait; pause() stops a host after a 429 / 503.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]]):
+        self.limits = limits
+        self._cond = threading.Condition()
+        self._tokens: Dict[str, float] = {}
+        self._updated: Dict[str, float] = {}
+        self._paused_until: Dict[str, float] = {}
+        self._waiting: Counter = Counter()   # (host, priority) -> blocked threads
+
+    def acquire(self, host: str, priority: str = "interactive", max_wait: Optional[float] = None) -> float:
+        """Take one token for host; returns the seconds waited."""
+        if host not in self.limits:
+            return 0.0
+        rate, burst = self.limits[host]
+        t0 = time.monotonic()
+        with self._cond:
+            self._waiting[(host, priority)] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    tokens = min(burst, self._tokens.get(host, burst) + (now - self._updated.get(host, now)) * rate)
+                    self._tokens[host], self._updated[host] = tokens, now
+                    paused = self._paused_until.get(host, 0.0) - now
+                    give_way = priority != "interactive" and self._waiting[(host, "interactive")] > 0
+                    if paused <= 0 and tokens >= 1 and not give_way:
+                        self._tokens[host] = tokens - 1
+                        return now - t0
+                    wait = paused if paused > 0 else max((1 - tokens) / rate, 1 / rate if give_way else 0.0)
+                    if max_wait is not None and now + wait - t0 > max_wait:
+                        metrics.inc("taj_ratelimit_rejected_total", host=host, priority=priority)
+                        raise UpstreamRateLimited(UPSTREAM_HOST_CB.get(host, host), wait)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[(host, priority)] -= 1
+                self._cond.notify_all()
+
+    def pause(self, host: str, seconds: float) -> None:
+        with self._cond:
+            self._paused_until[host] = max(self._paused_until.get(host, 0.0), time.monotonic() + seconds)
+            self._tokens[host] = 0.0
+            self._cond.notify_all()
+
+    def paused_for(self, host: str) -> float:
+        with self._cond:
+            return max(0.0, self._paused_until.get(host, 0.0) - time.monotonic())
+
+upstream_scheduler = HostScheduler(UPSTREAM_RATE_LIMITS)
+
+class ScheduledSession(requests.Session):
+    """Session whose requests to rate-limited hosts go through upstream_scheduler (redirect hops too)."""
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname or ""
+        if host not in upstream_scheduler.limits:
+            return super().send(request, **kwargs)
+        priority = request_priority.get()
+        waited = upstream_scheduler.acquire(host, priority, RATE_LIMIT_MAX_WAIT.get(priority))
+        metrics.observe("taj_ratelimit_wait_seconds", waited, host=host, priority=priority)
+        r = super().send(request, **kwargs)
+        if r.status_code in (429, 503):
+            delay = parse_retry_after(r.headers.get("Retry-After"))
+            upstream_scheduler.pause(host, delay)
+            metrics.inc("taj_ratelimit_throttled_total", host=host, status=str(r.status_code))
+            logger.warning("%s answered %s; pausing it for %.0f s", host, r.status_code, delay)
+            r.close()
+            raise UpstreamRateLimited(UPSTREAM_HOST_CB.get(host, host), delay)
+        return r
+
+# ---------------- shared HTTP session ----------------
+# One pooled session for the stateless fetchers (FSSC, Infinity, QSI, SISBEL), shared by the bot
+# handlers, bulk mode and the local HTTP API. QRO keeps a per-call session for its form cookies
+# (new_http_session) on the same connection pool. Both are rate limited per host (ScheduledSession).
+http_session = ScheduledSession()
+_http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+http_session.mount("https://", _http_adapter)
+http_session.mount("http://", _http_adapter)
+
+def mount_http_adapter(adapter: HTTPAdapter) -> None:
+    """Route all upstream traffic through adapter (upstream_replay.py record/replay)."""
+    global _http_adapter
+    _http_adapter = adapter
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+
+def new_http_session() -> requests.Session:
+    """Session with its own cookies on the shared transport."""
+    sess = ScheduledSession()
+    sess.mount("https://", _http_adapter)
+    sess.mount("http://", _http_adapter)
+    return sess
+
 # ---------------- simple in-memory cache (runtime) ----------------
-_cache: Dict[str, Any] = {}
+# key -> (expires_at or None, value)
+_cache: Dict[str, Tuple[Optional[float], Any]] = {}
 
 def cache_get(key: str) -> Optional[Any]:
-    return _cache.get(key)
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if expires_at is not None and expires_at <= time.time():
+        _cache.pop(key, None)
+        return None
+    return value
+
+def cache_set(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    """Store value for ttl seconds (CACHE_TTL by default); ttl=0 means no expiry."""
+    ttl = CACHE_TTL if ttl is None else ttl
+    _cache[key] = (time.time() + ttl if ttl else None, value)
+
+def cache_delete(key: str) -> None:
+    _cache.pop(key, None)
+
+def cache_expires_at(key: str) -> Optional[float]:
+    entry = _cache.get(key)
+    return entry[0] if entry else None
+
+def cache_purge_expired() -> int:
+    """Drop expired entries that were never read again; returns how many."""
+    now = time.time()
+    dead = [k for k, (expires_at, _v) in list(_cache.items()) if expires_at is not None and expires_at <= now]
+    for k in dead:
+        _cache.pop(k, None)
+    return len(dead)
+
+# ---------------- negative cache ----------------
+class BloomFilter:
+    """Fixed-size Bloom filter of strings; k bit positions from one blake2b digest (double hashing)."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        d = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+class RecentMisses:
+    """
+    Identifiers that missed upstream in the last `window` to 2 * `window` seconds: two Bloom
+    generations, the older one dropped at each rotation (or when the current one is full).
+    """
 
-def cache_set(key: str, value: Any) -> None:
-    _cache[key] = value
+    def __init__(self, window: float = MISS_WINDOW, capacity: int = MISS_FILTER_CAPACITY, fp_rate: float = MISS_FILTER_FP_RATE):
+        self.window = window
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity, fp_rate)
+        self._previous = BloomFilter(capacity, fp_rate)
+        self._rotated_at = time.time()
+
+    def _maybe_rotate(self) -> None:
+        if time.time() - self._rotated_at >= self.window or self._current.count >= self.capacity:
+            self._previous, self._current = self._current, BloomFilter(self.capacity, self.fp_rate)
+            self._rotated_at = time.time()
+
+    def add(self, item: str) -> bool:
+        """Record a miss; True if item had (probably) missed already within the window."""
+        with self._lock:
+            self._maybe_rotate()
+            seen = item in self._current or item in self._previous
+            self._current.add(item)
+            return seen
+
+_recent_misses: Dict[str, RecentMisses] = {}
+
+def _negative_key(cb: str, ident: str) -> str:
+    return f"neg:{cb}:{ident}"
+
+def known_miss(cb: str, ident: str) -> bool:
+    """ident recently came back "not found" from cb's upstream (answer locally)."""
+    return cache_get(_negative_key(cb, ident)) is not None
+
+def note_miss(cb: str, ident: str) -> None:
+    """Negative-cache a definite upstream "not found" (never call this for errors)."""
+    misses = _recent_misses.get(cb)
+    if misses is None:
+        misses = _recent_misses.setdefault(cb, RecentMisses())
+    repeated = misses.add(ident)
+    cache_set(_negative_key(cb, ident), True, ttl=NEGATIVE_TTL_REPEAT if repeated else NEGATIVE_TTL)
+    metrics.inc("taj_negative_cache_stores_total", cb=cb, repeated="yes" if repeated else "no")
+
+def _negative_lookup(cb: str, ident: str) -> bool:
+    hit = known_miss(cb, ident)
+    metrics.inc("taj_cache_lookups_total", cb=cb, layer="negative", result="hit" if hit else "miss")
+    return hit
+
+# ---------------- metrics ----------------
+class Metrics:
+    """Thread-safe counters and fixed-bucket histograms, rendered in Prometheus text format."""
+
+    def __init__(self, buckets: Tuple[float, ...] = METRICS_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple], float] = {}
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._hists: Dict[Tuple[str, Tuple], List[float]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None:
+                h = self._hists[key] = [0] * (len(self.buckets) + 2)
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    h[i] += 1
+                    break
+            else:
+                h[len(self.buckets)] += 1
+            h[-1] += value
+
+    def histograms(self, name: str) -> Dict[Tuple, List[float]]:
+        with self._lock:
+            return {labels: list(h) for (n, labels), h in self._hists.items() if n == name}
+
+    def counters(self, name: str) -> Dict[Tuple, float]:
+        with self._lock:
+            return {labels: v for (n, labels), v in self._counters.items() if n == name}
+
+    def gauges(self, name: str) -> Dict[Tuple, float]:
+        with self._lock:
+            return {labels: v for (n, labels), v in self._gauges.items() if n == name}
+
+    def quantile(self, h: List[float], q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf if above the last bucket)."""
+        total = sum(h[:-1])
+        seen = 0
+        for i, le in enumerate(self.buckets):
+            seen += h[i]
+            if total and seen >= q * total:
+                return le
+        return float("inf")
+
+    def render_prometheus(self) -> str:
+        def fmt(labels: Tuple, extra: Tuple = ()) -> str:
+            items = labels + extra
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+        out: List[str] = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({n for n, _ in series}):
+                    out.append(f"# TYPE {name} {kind}")
+                    out.extend(f"{name}{fmt(labels)} {v:g}" for (n, labels), v in sorted(series.items()) if n == name)
+            for name in sorted({n for n, _ in self._hists}):
+                out.append(f"# TYPE {name} histogram")
+                for (n, labels), h in sorted(self._hists.items()):
+                    if n != name:
+                        continue
+                    cum = 0
+                    for le, c in zip(self.buckets, h):
+                        cum += c
+                        out.append(f"{name}_bucket{fmt(labels, (('le', f'{le:g}'),))} {cum:g}")
+                    cum += h[len(self.buckets)]
+                    out.append(f"{name}_bucket{fmt(labels, (('le', '+Inf'),))} {cum:g}")
+                    out.append(f"{name}_sum{fmt(labels)} {h[-1]:.6f}")
+                    out.append(f"{name}_count{fmt(labels)} {cum:g}")
+        return "\n".join(out) + "\n"
+
+metrics = Metrics()
+
+# Per-stage latency: taj_stage_seconds{stage=fetch|parse|format|send, cb, cache=hit|miss}.
+# cache is "hit" when the result came from the runtime cache without an upstream call;
+# it is tracked per asyncio task (set by run_fetcher / verify_certificate).
+_cache_state: contextvars.ContextVar[str] = contextvars.ContextVar("taj_cache_state", default="miss")
+_stage_local = threading.local()   # upstream time spent by the fetcher running in this thread
+
+@contextmanager
+def stage_timer(stage: str, cb: str, cache: Optional[str] = None):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.inc("taj_stage_errors_total", stage=stage, cb=cb)
+        raise
+    finally:
+        dt = time.perf_counter() - t0
+        metrics.observe("taj_stage_seconds", dt, stage=stage, cb=cb, cache=cache or ("miss" if stage in ("fetch", "parse") else _cache_state.get()))
+        if stage == "fetch":
+            _stage_local.fetch_s = getattr(_stage_local, "fetch_s", 0.0) + dt
+
+def instrumented_fetcher(cb: str):
+    """Decorator for blocking fetchers: time inside stage_timer("fetch") counts as fetch, the rest as parse."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            _stage_local.fetch_s = 0.0
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                fetch_s = _stage_local.fetch_s
+                metrics.inc("taj_cache_lookups_total", cb=cb, layer="fetcher", result="miss" if fetch_s else "hit")
+                if fetch_s:
+                    metrics.observe("taj_stage_seconds", time.perf_counter() - t0 - fetch_s, stage="parse", cb=cb, cache="miss")
+        return wrapper
+    return deco
+
+def timed_stage(stage: str, cb: str):
+    """Decorator timing a synchronous step (the result formatters)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage, cb):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+_background_tasks: Set["asyncio.Task"] = set()   # the event loop itself only keeps weak references
+
+def spawn_background(coro) -> "asyncio.Task":
+    """create_task for fire-and-forget work, referenced until done so it is not garbage-collected mid-flight."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+class UpstreamBusy(Exception):
+    """A certification body's fetch pool and queue are full; the caller should ask the user to retry."""
+
+    def __init__(self, cb: str):
+        super().__init__(f"{cb} is busy")
+        self.cb = cb
+
+class UpstreamRateLimited(UpstreamBusy):
+    """The body's host is rate limited (our bucket or its 429 / Retry-After) for retry_in more seconds."""
+
+    def __init__(self, cb: str, retry_in: float):
+        super().__init__(cb)
+        self.retry_in = retry_in
+
+class CountingExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that counts its queued and running work items and the worker threads
+    that have run something, through submit() only (no executor internals), for the watchdog.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._count_lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self._seen_threads: set = set()
+
+    @property
+    def threads(self) -> int:
+        return len(self._seen_threads)
+
+    def submit(self, fn, /, *args, **kwargs):
+        started = False
+
+        def run():
+            nonlocal started
+            with self._count_lock:
+                started = True
+                self.queued -= 1
+                self.running += 1
+                self._seen_threads.add(threading.get_ident())
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._count_lock:
+                    self.running -= 1
+
+        def done(_fut) -> None:
+            if not started:   # cancelled before a worker picked it up
+                with self._count_lock:
+                    self.queued -= 1
+
+        with self._count_lock:
+            self.queued += 1
+        try:
+            fut = super().submit(run)
+        except BaseException:
+            with self._count_lock:
+                self.queued -= 1
+            raise
+        fut.add_done_callback(done)
+        return fut
+
+_upstream_pools: Dict[str, CountingExecutor] = {}
+_upstream_inflight: Counter = Counter()   # running + queued per body (event-loop thread only)
+
+def upstream_pool(cb: str) -> CountingExecutor:
+    pool = _upstream_pools.get(cb)
+    if pool is None:
+        pool = _upstream_pools[cb] = CountingExecutor(max_workers=CERT_BODIES[cb].workers, thread_name_prefix=f"taj-{cb}")
+    return pool
+
+def _fetcher_cached(cb: str, args: Tuple) -> bool:
+    """The fetcher would answer from the runtime cache (no upstream call, nothing to queue for)."""
+    prefix = CERT_BODIES[cb].cache_prefix
+    force = len(args) > 1 and args[1] is True
+    if not prefix or not args or force:
+        return False
+    return cache_get(f"{prefix}:{args[0]}") is not None or known_miss(cb, args[0])
+
+def _call_fetcher(fn, *args) -> Tuple[Any, bool]:
+    result = fn(*args)
+    return result, bool(getattr(_stage_local, "fetch_s", 0.0))
+
+async def run_fetcher(cb: str, fn, *args) -> Any:
+    """
+    Run a blocking fetcher on its body's pool and record hit/miss for this task's later stages.
+    Cached answers are served inline; raises UpstreamBusy when the body's queue is full.
+    The identifier (first argument) is canonicalized for cb first.
+    """
+    if args and CERT_BODIES[cb].canonical:
+        canon = canonical_id(cb, args[0])
+        rewritten, args = canon != args[0], (canon,) + args[1:]
+    else:
+        rewritten = False
+    if _fetcher_cached(cb, args):
+        if rewritten:
+            metrics.inc("taj_canonical_hits_total", cb=cb, layer="fetcher")
+        result, went_upstream = _call_fetcher(fn, *args)
+    else:
+        limit = CERT_BODIES[cb].workers + CERT_BODIES[cb].queue_limit
+        if _upstream_inflight[cb] >= limit:
+            metrics.inc("taj_upstream_rejected_total", cb=cb)
+            raise UpstreamBusy(cb)
+        _upstream_inflight[cb] += 1
+        metrics.set("taj_upstream_inflight", _upstream_inflight[cb], cb=cb)
+        try:
+            ctx = contextvars.copy_context()
+            result, went_upstream = await asyncio.get_running_loop().run_in_executor(
+                upstream_pool(cb), functools.partial(ctx.run, _call_fetcher, fn, *args))
+        finally:
+            _upstream_inflight[cb] -= 1
+            metrics.set("taj_upstream_inflight", _upstream_inflight[cb], cb=cb)
+    _cache_state.set("miss" if went_upstream else "hit")
+    return result
+
+# ---------------- HTML parser processes ----------------
+# The fetchers only do HTTP in their threads; the raw page goes to a parser process via run_parser
+# and a compact dict comes back, so parsing under bulk / burst load uses every core. Parsers are
+# pure module-level functions (picklable, no cache or index side effects).
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+def parse_pool() -> Optional[ProcessPoolExecutor]:
+    """The shared parser pool (created on first use), or None when PARSE_WORKERS is 0."""
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: forking a process that already runs fetch threads can inherit held locks
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+def shutdown_parse_pool(wait: bool = True) -> None:
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+def run_parser(fn, *args) -> Any:
+    """Blocking: fn(*args) in a parser process (inline without a pool or if the pool broke)."""
+    pool = parse_pool()
+    if pool is None:
+        return fn(*args)
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        logger.exception("Parser process died; restarting the pool and parsing inline")
+        metrics.inc("taj_parse_pool_restarts_total")
+        shutdown_parse_pool(wait=False)
+        return fn(*args)
+
+# streamed-fetch section test (CertBody.section_end), called on each closed element: True once
+# the part of the page the body's parser reads is complete. Only for parsers scoped to one element
+# (parse_fssc_detail reads article#certification-body-detail); parse_qsi_page reads the whole page.
+def _fssc_section_end(el) -> bool:
+    return el.tag == "article" and (el.get("id") == "certification-body-detail"
+                                    or "page-content--certification-body" in (el.get("class") or ""))
+
+class SectionWatcher:
+    """Incremental lxml parse of a downloading page that reports when the target section has closed."""
+
+    def __init__(self, section_end):
+        self.section_end = section_end
+        self.parser = etree.HTMLPullParser(events=("end",))
+        self.done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        self.parser.feed(chunk)
+        for _event, el in self.parser.read_events():
+            if self.section_end(el):
+                self.done = True
+                break
+        return self.done
+
+def read_page_body(cb: str, r: requests.Response) -> bytes:
+    """
+    Body of a stream=True response. With a section watcher for cb, reading stops at the chunk
+    where the target section closes and the connection is dropped instead of draining the rest.
+    """
+    section_end = CERT_BODIES[cb].section_end if STREAM_FETCH else None
+    if section_end is None or r.status_code != 200:
+        body = r.content
+    else:
+        watcher = SectionWatcher(section_end)
+        chunks = []
+        for chunk in r.iter_content(STREAM_CHUNK):
+            chunks.append(chunk)
+            if watcher.feed(chunk):
+                metrics.inc("taj_stream_early_stops_total", cb=cb)
+                break
+        body = b"".join(chunks)
+    r.close()
+    metrics.inc("taj_upstream_bytes_total", len(body), cb=cb)
+    return body
+
+def fetch_page_parsed(cb: str, url: str, headers: Dict[str, str], parser, *args) -> Tuple[requests.Response, Any]:
+    """
+    GET url (streamed, see read_page_body) and parse it with run_parser(parser, text, *args)
+    -> (response, parsed).
+    Sends If-None-Match / If-Modified-Since from the last 200; on 304, or when the body's sha1
+    equals the last one, the last parsed result is reused without parsing. parsed is None
+    for any other status. Callers get a copy and may modify it.
+    """
+    key = f"page:{url}"
+    page = cache_get(key)
+    headers = dict(headers)
+    if page and page.get("etag"):
+        headers["If-None-Match"] = page["etag"]
+    if page and page.get("last_modified"):
+        headers["If-Modified-Since"] = page["last_modified"]
+    with stage_timer("fetch", cb):
+        r = http_session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True)
+        body = read_page_body(cb, r)
+    if r.status_code == 304 and page:
+        metrics.inc("taj_cache_lookups_total", cb=cb, layer="page", result="hit")
+        metrics.inc("taj_page_parse_skipped_total", cb=cb, reason="not_modified")
+        cache_set(key, page, ttl=PAGE_META_TTL)
+        return r, copy.deepcopy(page["parsed"])
+    if r.status_code != 200:
+        return r, None
+    digest = hashlib.sha1(body).hexdigest()
+    same_body = bool(page) and page["sha1"] == digest
+    metrics.inc("taj_cache_lookups_total", cb=cb, layer="page", result="hit" if same_body else "miss")
+    if same_body:
+        metrics.inc("taj_page_parse_skipped_total", cb=cb, reason="same_body")
+        parsed = page["parsed"]
+    else:
+        parsed = run_parser(parser, body.decode(r.encoding or "utf-8", "replace"), *args)
+    cache_set(key, {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                    "sha1": digest, "parsed": parsed}, ttl=PAGE_META_TTL)
+    return r, copy.deepcopy(parsed)
 
 # ---------------- helpers ----------------
 def validate_date_input(s: str) -> Optional[str]:
@@ -179,8 +918,77 @@ def validate_date_input(s: str) -> Optional[str]:
         return s
     return None
 
-async def safe_send_text(chat_send, text: str, parse_mode=ParseMode.HTML, **kwargs):
+def normalize_cb_name(s: str) -> Optional[str]:
+    """User-typed body name -> CERT_BODIES key (CB_ALIASES, compared alphanumerics-only, lowercase)."""
+    return CB_ALIASES.get(re.sub(r"[^a-z0-9]", "", (s or "").lower()))
+
+# ---------------- identifier canonicalization ----------------
+# Certificate numbers / COIDs are canonicalized per body before the cache, the live-check
+# single-flight and the upstream request, so "abc-123 ", "ABC-123" and "ABC 123" share one entry.
+# Company names already go through normalize_company_name (FSSC name index, search cache).
+_DASHES_RE = re.compile(r"[\u2010-\u2015\u2212\ufe58\ufe63\uff0d]")
+_ID_LABEL_RE = re.compile(r"(?i)^(?:certificate|cert\.?)?\s*(?:no|nr|number|num|id)\s*[.:#]\s*")
+_COID_LABEL_RE = re.compile(r"(?i)^coid\s*[.:#\-]?\s*")
+
+def _ascii_digits(s: str) -> str:
+    """Arabic-Indic / Persian / other Unicode decimal digits -> 0-9."""
+    return "".join(str(unicodedata.decimal(ch)) if not ch.isascii() and unicodedata.decimal(ch, None) is not None else ch for ch in s)
+
+def _canonical_cert_no(raw: str) -> str:
+    s = _ascii_digits(unicodedata.normalize("NFKC", raw or ""))
+    s = _DASHES_RE.sub("-", s).strip()
+    s = _ID_LABEL_RE.sub("", s)
+    s = re.sub(r"\s*-\s*", "-", s)
+    s = re.sub(r"[\s_]+", "-", s)
+    return re.sub(r"-{2,}", "-", s).strip("-").upper()
+
+def _canonical_coid(raw: str) -> str:
+    s = _DASHES_RE.sub("-", unicodedata.normalize("NFKC", raw or "")).strip()
+    return _canonical_cert_no(_COID_LABEL_RE.sub("", s))
+
+def canonical_id(cb: str, raw: str) -> str:
+    """Canonical certificate number / COID for cb (CertBody.canonical, idempotent); rewrites are counted per body."""
+    body = CERT_BODIES.get(cb)
+    fn = body.canonical if body else None
+    if fn is None or raw is None:
+        return raw
+    canon = fn(raw)
+    if canon != raw:
+        metrics.inc("taj_id_rewrites_total", cb=cb)
+    return canon
+
+def parse_verify_query(text: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """
+    Parse "<body> <number> [date]" (e.g. "fssc AFG-1-7798-696622", "qro_com 1234 2025-10-10").
+    Returns (cb, cert_no, issue_date) or None. A trailing token that looks like a date
+    is taken as the issue date; FSSC numbers may be prefixed with "COID:".
+    """
+    parts = (text or "").split()
+    if len(parts) < 2:
+        return None
+    cb = normalize_cb_name(parts[0])
+    if not cb or not CERT_BODIES[cb].quick:
+        return None
+    rest = parts[1:]
+    issue_date = None
+    if len(rest) > 1 and validate_date_input(rest[-1]):
+        issue_date = validate_date_input(rest[-1])
+        rest = rest[:-1]
+    cert_no = canonical_id(cb, " ".join(rest))
+    if not cert_no:
+        return None
+    return cb, cert_no, issue_date
+
+def html_to_lines(text: str) -> List[str]:
+    """Strip tags from a formatted result and return its non-empty lines."""
+    return [ln.strip() for ln in html.unescape(re.sub(r"<[^>]+>", "", text or "")).splitlines() if ln.strip()]
+
+async def safe_send_text(chat_send, text: str, parse_mode=ParseMode.HTML, cb: Optional[str] = None, **kwargs):
+    """Send HTML, falling back to plain text; cb times the send as a verification result."""
     try:
+        if cb:
+            with stage_timer("send", cb):
+                return await chat_send(text, parse_mode=parse_mode, **kwargs)
         return await chat_send(text, parse_mode=parse_mode, **kwargs)
     except Exception:
         try:
@@ -223,28 +1031,69 @@ def generate_captcha() -> Tuple[str, str]:
         ans = str(c)
     return q, ans
 
-def start_captcha_for_user(context_user_data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
-    """
-    Initialize captcha fields in user_data and return the question text.
-    """
-    q, ans = generate_captcha()
-    # keep previous behavior of /start clearing state for a fresh captcha
-    context_user_data.clear()
-    context_user_data["awaiting_captcha"] = True
-    context_user_data["captcha_question"] = q
-    context_user_data["captcha_answer"] = ans
-    context_user_data["captcha_attempts"] = 3
-    context_user_data["verified"] = False
-    return q, context_user_data
+# ---------------- conversation state ----------------
+class Step(enum.IntEnum):
+    """What the user's next text message answers; text_message_handler dispatches on it via TEXT_STEPS."""
+    IDLE = 0
+    CAPTCHA = 1
+    FSSC_COMPANY = 2    # company name to resolve to an FSSC COID
+    BODY_INPUT = 3      # Conversation.awaiting, one of CERT_BODIES[cb].inputs
 
-def clear_flow_keep_verified(user_data: Dict[str, Any]) -> None:
-    """Clear temporary flow keys but preserve the 'verified' flag if present.
-    Use this instead of user_data.clear() when you want to reset inputs but keep verification.
+@dataclass(slots=True)
+class Conversation:
+    """
+    Per-user conversation state, one object in user_data["conv"]: the current step plus the
+    slots it needs. reset() returns to IDLE in place and keeps the verification (and picks).
     """
-    verified = user_data.get("verified")
-    user_data.clear()
-    if verified:
-        user_data["verified"] = True
+    step: Step = Step.IDLE
+    verified: bool = False
+    captcha_question: Optional[str] = None
+    captcha_answer: Optional[str] = None
+    captcha_attempts: int = 0
+    cb: Optional[str] = None
+    awaiting: Optional[str] = None
+    inputs: Dict[str, str] = field(default_factory=dict)
+    cert_type: Optional[str] = None
+    fssc_standard: Optional[str] = None
+    last_company: Optional[str] = None   # last FSSC company-name search (for the candidate keyboard)
+    fssc_picks: Dict[str, str] = field(default_factory=dict)   # normalized company name -> COID this user picked
+    inline_seq: int = 0                  # inline-query debounce sequence
+
+    def reset(self) -> None:
+        self.step = Step.IDLE
+        self.captcha_question = self.captcha_answer = None
+        self.captcha_attempts = 0
+        self.cb = self.awaiting = None
+        self.inputs.clear()
+        self.cert_type = self.fssc_standard = self.last_company = None
+
+    def start_captcha(self) -> str:
+        """Fresh captcha (like /start, this drops an earlier verification); returns the question."""
+        self.reset()
+        self.verified = False
+        self.captcha_question, self.captcha_answer = generate_captcha()
+        self.captcha_attempts = 3
+        self.step = Step.CAPTCHA
+        return self.captcha_question
+
+    def pending_captcha(self) -> str:
+        """The captcha question being asked, started if there is none."""
+        return self.captcha_question if self.step is Step.CAPTCHA else self.start_captcha()
+
+    def begin_body(self, cb: str) -> str:
+        """Start collecting cb's inputs (CertBody.inputs); returns the prompt for the first one."""
+        body = CERT_BODIES.get(cb) or CERT_BODIES["other"]
+        self.step = Step.BODY_INPUT
+        self.cb = body.key
+        self.awaiting = body.inputs[0]
+        self.inputs.clear()
+        return body.prompt(body.inputs[0], first=True)
+
+def conversation(user_data: Dict[str, Any]) -> Conversation:
+    conv = user_data.get("conv")
+    if conv is None:
+        conv = user_data["conv"] = Conversation()
+    return conv
 
 # ---------------- (All verification functions unchanged) ----------------
 # For brevity in this file these functions remain the same as in the original bot:
@@ -259,27 +1108,11 @@ def clear_flow_keep_verified(user_data: Dict[str, Any]) -> None:
 # a helper to find COID by company name on FSSC public-register pages.
 
 # ---------- FSSC ----------
-def fetch_fssc_by_coid(coid: str) -> Any:
-    key = f"fssc:{coid}"
-    cached = cache_get(key)
-    if cached:
-        return cached
-    url = f"https://www.fssc.com/public-register/{coid}/"
-    headers = {"User-Agent": "Mozilla/5.0 (compatible; CertCheckBot/1.0)"}
-    try:
-        r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-    except Exception as e:
-        logger.exception("FSSC fetch error: %s", e)
-        return {"error": str(e)}
-    if r.status_code == 404:
-        return "not_found"
-    if r.status_code != 200:
-        return {"error": f"HTTP {r.status_code}"}
-    soup = BeautifulSoup(r.text, "html.parser")
+def parse_fssc_detail(html_text: str, coid: str) -> Any:
+    """FSSC public-register detail page -> data dict, or "not_found" (pure; runs in a parser process)."""
+    soup = BeautifulSoup(html_text, "html.parser")
     article = soup.select_one("article#certification-body-detail, article.page-content--certification-body")
     if not article:
-        if "No results found" in r.text or "No certificates match" in r.text:
-            return "not_found"
         return "not_found"
     data = {}
     org = article.select_one("h1.page-header__title, header.page-header h1")
@@ -323,19 +1156,43 @@ def fetch_fssc_by_coid(coid: str) -> Any:
             title_span = li.find("span", class_="title")
             cats.append({"code": scope_span.get_text(strip=True) if scope_span else None, "title": title_span.get_text(strip=True) if title_span else None})
     data["categories"] = cats
+    return data
+
+@instrumented_fetcher("fssc")
+def fetch_fssc_by_coid(coid: str, force: bool = False) -> Any:
+    key = f"fssc:{coid}"
+    cached = None if force else cache_get(key)
+    if cached:
+        return cached
+    if not force and _negative_lookup("fssc", coid):
+        return "not_found"
+    url = f"https://www.fssc.com/public-register/{coid}/"
+    headers = {"User-Agent": "Mozilla/5.0 (compatible; CertCheckBot/1.0)"}
+    try:
+        r, data = fetch_page_parsed("fssc", url, headers, parse_fssc_detail, coid)
+    except UpstreamBusy:
+        raise
+    except Exception as e:
+        logger.exception("FSSC fetch error: %s", e)
+        return {"error": str(e)}
+    if r.status_code == 404:
+        note_miss("fssc", coid)
+        return "not_found"
+    if data is None:
+        return {"error": f"HTTP {r.status_code}"}
+    if not isinstance(data, dict):
+        note_miss("fssc", coid)
+        return data
     data["fssc_url"] = url
     cache_set(key, data)
+    fssc_mirror.add(data.get("coid") or coid, data.get("organization"),
+                    scheme=data.get("scheme"), valid_until=data.get("valid_until"), address=data.get("address"))
     # store mapping by organization name if available
-    try:
-        name_key = data.get("organization", "").strip().lower()
-        if name_key:
-            idx = cache_get("fssc_name_index") or {}
-            idx[name_key] = data.get("coid") or coid
-            cache_set("fssc_name_index", idx)
-    except Exception:
-        pass
+    if data.get("organization"):
+        fssc_name_index.add(data["organization"], data.get("coid") or coid)
     return data
 
+@timed_stage("format", "fssc")
 def format_fssc_result(data: dict) -> Optional[str]:
     esc = html.escape
     if not data or data == "not_found":
@@ -360,14 +1217,21 @@ def format_fssc_result(data: dict) -> Optional[str]:
     return "\n".join(lines)
 
 # ---------- Infinity ----------
-def infinity_post_cert(cert_no: str) -> Optional[Dict]:
+@instrumented_fetcher("infinity")
+def infinity_post_cert(cert_no: str, force: bool = False) -> Optional[Dict]:
+    """Certificate record, None when the API does not know cert_no, {"error": ...} when the lookup failed."""
     key = f"infty:{cert_no}"
-    cached = cache_get(key)
+    cached = None if force else cache_get(key)
     if cached:
         return cached
+    if not force and _negative_lookup("infinity", cert_no):
+        return None
     try:
-        r = requests.post(INFINITY_API_URL, data={"postID": cert_no}, headers=INFINITY_HEADERS, timeout=20)
-        r.raise_for_status()
+        with stage_timer("fetch", "infinity"):
+            r = http_session.post(INFINITY_API_URL, data={"postID": cert_no}, headers=INFINITY_HEADERS, timeout=20)
+        if not r.ok:
+            logger.warning("Infinity API returned HTTP %s for %s", r.status_code, cert_no)
+            return {"error": f"HTTP {r.status_code}"}
         j = r.json()
         if isinstance(j, dict) and j.get("success"):
             for k, v in j.items():
@@ -377,11 +1241,15 @@ def infinity_post_cert(cert_no: str) -> Optional[Dict]:
             if isinstance(j.get("data"), dict):
                 cache_set(key, j["data"])
                 return j["data"]
+        note_miss("infinity", cert_no)
         return None
+    except UpstreamBusy:
+        raise
     except Exception as e:
         logger.exception("Infinity API error: %s", e)
-        return None
+        return {"error": str(e)}
 
+@timed_stage("format", "infinity")
 def format_infty(obj: dict) -> Optional[str]:
     if not obj:
         return None
@@ -450,11 +1318,13 @@ def parse_certificate_from_html(html_text: str) -> Dict[str, Optional[str]]:
             parsed[k] = v.strip() or None
     return parsed
 
+@instrumented_fetcher("qro_com")
 def submit_qro_com(cert_no: str, issue_date: str) -> Tuple[bool, Dict[str, Optional[str]]]:
     try:
-        sess = requests.Session()
+        sess = new_http_session()
         sess.headers.update({"User-Agent": "CertCheckBot/1.0"})
-        r = sess.get(QRO_COM_VERIFY, timeout=15)
+        with stage_timer("fetch", "qro_com"):
+            r = sess.get(QRO_COM_VERIFY, timeout=15)
         r.raise_for_status()
         soup = BeautifulSoup(r.text, "lxml")
         payload = extract_hidden_inputs(soup)
@@ -464,19 +1334,24 @@ def submit_qro_com(cert_no: str, issue_date: str) -> Tuple[bool, Dict[str, Optio
         payload[cert_name] = cert_no
         payload[date_name] = issue_date
         payload[btn_name] = "Submit"
-        post = sess.post(QRO_COM_VERIFY, data=payload, headers={"Referer": QRO_COM_VERIFY, "User-Agent": "CertCheckBot/1.0"}, timeout=15)
+        with stage_timer("fetch", "qro_com"):
+            post = sess.post(QRO_COM_VERIFY, data=payload, headers={"Referer": QRO_COM_VERIFY, "User-Agent": "CertCheckBot/1.0"}, timeout=15)
         post.raise_for_status()
-        parsed = parse_certificate_from_html(post.text)
+        parsed = run_parser(parse_certificate_from_html, post.text)
         return True, parsed
+    except UpstreamBusy:
+        raise
     except Exception as e:
         logger.exception("submit_qro_com error: %s", e)
         return False, {"error": str(e)}
 
+@instrumented_fetcher("qro_org")
 def submit_qro_org(cert_no: str, issue_date: str) -> Tuple[bool, Dict[str, Optional[str]]]:
     try:
-        sess = requests.Session()
+        sess = new_http_session()
         sess.headers.update({"User-Agent": "CertCheckBot/1.0"})
-        r = sess.get(QRO_ORG_PAGE, timeout=15)
+        with stage_timer("fetch", "qro_org"):
+            r = sess.get(QRO_ORG_PAGE, timeout=15)
         r.raise_for_status()
         soup = BeautifulSoup(r.text, "lxml")
         payload = extract_hidden_inputs(soup)
@@ -486,14 +1361,18 @@ def submit_qro_org(cert_no: str, issue_date: str) -> Tuple[bool, Dict[str, Optio
         payload[cert_name] = cert_no
         payload[date_name] = issue_date
         payload[btn_name] = "Submit"
-        post = sess.post(QRO_ORG_PAGE, data=payload, headers={"Referer": QRO_ORG_PAGE, "User-Agent": "CertCheckBot/1.0"}, timeout=15)
+        with stage_timer("fetch", "qro_org"):
+            post = sess.post(QRO_ORG_PAGE, data=payload, headers={"Referer": QRO_ORG_PAGE, "User-Agent": "CertCheckBot/1.0"}, timeout=15)
         post.raise_for_status()
-        parsed = parse_certificate_from_html(post.text)
+        parsed = run_parser(parse_certificate_from_html, post.text)
         return True, parsed
+    except UpstreamBusy:
+        raise
     except Exception as e:
         logger.exception("submit_qro_org error: %s", e)
         return False, {"error": str(e)}
 
+@timed_stage("format", "qro")
 def format_qro(parsed: dict) -> Optional[str]:
     if not parsed:
         return None
@@ -508,6 +1387,48 @@ def format_qro(parsed: dict) -> Optional[str]:
     lines.append(f"<b>📍 Address:</b> {esc(parsed.get('address') or '-')}") 
     return "\n".join(lines)
 
+# ---------- SISBEL ----------
+@instrumented_fetcher("sisbel")
+def fetch_sisbel(cert_no: str, company: str) -> Dict[str, Any]:
+    """POST a SISBEL lookup; returns the JSON reply ({"success", "data"}) or {"error": ...}."""
+    payload = {
+        "firmaaranan": company,
+        "belgenoaranan": cert_no,
+        "captcha": {"sayi1": 0, "sayi2": 0, "operator": "*", "cevap": 0}
+    }
+    try:
+        with stage_timer("fetch", "sisbel"):
+            r = http_session.post(SISBEL_API_URL, json=payload, timeout=REQUEST_TIMEOUT)
+        r.raise_for_status()
+        return r.json()
+    except UpstreamBusy:
+        raise
+    except Exception as e:
+        logger.exception("SISBEL API error: %s", e)
+        return {"error": str(e)}
+
+@timed_stage("format", "sisbel")
+def format_sisbel(cert: dict) -> Optional[str]:
+    if not cert:
+        return None
+    esc = html.escape
+    fields = [
+        ("🏢", "Company", "firma"),
+        ("🏙", "City/Province", "il"),
+        ("📍", "Address", "adres"),
+        ("🏳", "Country", "ulke"),
+        ("🎖", "Standard", "belge"),
+        ("🔑", "Certificate Number", "sertifikaNo"),
+        ("📋", "Scope", "kapsam"),
+        ("📅", "Validity Date", "belgegecerliliktarihi"),
+        ("✔", "Validity Status", "belgegecerlilikdurumu"),
+    ]
+    lines = ["<b>✅ Certificate Details:</b>", ""]
+    for icon, label, k in fields:
+        val = cert.get(k)
+        lines.append(f"{icon} <b>{esc(label)}:</b> {esc(str(val)) if val not in (None, '') else '-'}")
+    return "\n".join(lines)
+
 # ---------- QSI scraping ----------
 def _text_after_colon(s: str) -> Optional[str]:
     if not s:
@@ -555,22 +1476,8 @@ def _extract_neighbor_value(node):
         return after
     return None
 
-def fetch_qsi_simple(cert_no: str) -> Dict[str, Optional[str]]:
-    key = f"qsi:{cert_no}"
-    cached = cache_get(key)
-    if cached:
-        return cached
-
-    url = QSI_BASE + str(cert_no)
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141 Safari/537.36"}
-    try:
-        r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        r.raise_for_status()
-        html_text = r.text
-    except Exception as e:
-        logger.exception("QSI GET error: %s", e)
-        return {"error": str(e)}
-
+def parse_qsi_page(html_text: str) -> Dict[str, Optional[str]]:
+    """QSI certificate page -> field dict (pure; runs in a parser process)."""
     soup = BeautifulSoup(html_text, "lxml")
 
     logo_url = None
@@ -663,12 +1570,41 @@ def fetch_qsi_simple(cert_no: str) -> Dict[str, Optional[str]]:
                         break
         parsed[fld] = val.strip() if isinstance(val, str) and val.strip() else None
 
+    return parsed
+
+@instrumented_fetcher("qsi")
+def fetch_qsi_simple(cert_no: str, force: bool = False) -> Dict[str, Optional[str]]:
+    key = f"qsi:{cert_no}"
+    cached = None if force else cache_get(key)
+    if cached:
+        return cached
+    if not force and _negative_lookup("qsi", cert_no):
+        return {}
+
+    url = QSI_BASE + str(cert_no)
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141 Safari/537.36"}
+    try:
+        r, parsed = fetch_page_parsed("qsi", url, headers, parse_qsi_page)
+        r.raise_for_status()
+    except UpstreamBusy:
+        raise
+    except Exception as e:
+        logger.exception("QSI GET error: %s", e)
+        return {"error": str(e)}
+    if parsed is None:
+        return {"error": f"HTTP {r.status_code}"}
+    if not any(parsed.get(k) for k in ("name", "certificate_id", "standard")):
+        # no certificate on the page (checked before the certificate_id fallback below)
+        note_miss("qsi", cert_no)
+        return {}
+
     if not parsed.get("certificate_id"):
         parsed["certificate_id"] = str(cert_no)
 
     cache_set(key, parsed)
     return parsed
 
+@timed_stage("format", "qsi")
 def format_qsi_simple(parsed: dict) -> Optional[str]:
     if not parsed:
         return None
@@ -694,168 +1630,839 @@ def format_qsi_simple(parsed: dict) -> Optional[str]:
     lines.append(f"<b>✅ Status:</b> {esc(parsed.get('status') or '-')}")
     return "\n".join(lines)
 
-# ---------------- New helper: find COID by company name on FSSC ----------------
-def find_coid_by_company_name(company_name: str) -> Optional[str]:
+# ---------------- FSSC register mirror (local company-name index) ----------------
+# trailing legal-form tokens ignored when comparing company names
+# (unambiguous forms only: "as", "sa", "co", "san", "ve", "est"... are also ordinary name words)
+LEGAL_SUFFIXES = {
+    "ltd", "limited", "llc", "llp", "lp", "inc", "incorporated", "company", "corp", "corporation",
+    "plc", "pvt", "private", "pty", "gmbh", "ag", "kg", "sas", "sarl", "srl", "spa", "bv", "nv",
+    "oy", "ab", "kft", "sro", "doo", "ooo", "jsc", "pjsc", "cjsc", "sti", "tic",
+    "fze", "fzco", "fzc", "wll",
+}
+
+def normalize_company_name(name: str) -> str:
     """
-    Resolve COID by searching the FSSC public-register search endpoint:
-      https://www.fssc.com/public-register/?search=<encoded>
-    Strategy:
-      1) Look for text like "COID: AFG-1-7798-696622" in raw html (case-insensitive).
-      2) Parse <span class="co-id"> and extract COID text.
-      3) Fallback: find hrefs like /public-register/<coid>
-    Caches found mapping under 'fssc_name_index'.
+    Canonical form for company-name matching: accents folded, lowercase, punctuation
+    folded to spaces, whitespace collapsed and trailing legal suffixes (Ltd, LLC, GmbH...)
+    stripped, so "Acme Foods Ltd." and "ACME FOODS LIMITED" both become "acme foods".
     """
-    if not company_name:
-        return None
-    name_key = re.sub(r"\s+", " ", company_name.strip().lower())
-    # check cache
-    idx = cache_get("fssc_name_index") or {}
-    if name_key in idx:
-        return idx[name_key]
+    folded = "".join(ch for ch in unicodedata.normalize("NFKD", name or "") if not unicodedata.combining(ch))
+    tokens = re.sub(r"[^\w]+", " ", folded.lower()).replace("_", " ").split()
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+def _trigrams(norm: str) -> set:
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _overlap_score(shared: int, qlen: int, rlen: int) -> float:
+    # mostly how much of the query is contained in the name (partial names), plus Dice similarity
+    return round(0.7 * (shared / qlen) + 0.3 * (2 * shared / (qlen + (rlen or 1))), 3)
+
+def name_similarity(query: str, name: str) -> float:
+    """Company-name similarity in [0, 1], same scoring as TrigramIndex.search."""
+    qgrams = _trigrams(normalize_company_name(query))
+    if not qgrams:
+        return 0.0
+    rgrams = _trigrams(normalize_company_name(name))
+    return _overlap_score(len(qgrams & rgrams), len(qgrams), len(rgrams))
+
+class TrigramIndex:
+    """
+    Inverted trigram index over normalized names (id -> name). Not thread-safe on its own;
+    owners guard it with their lock.
+    """
+
+    def __init__(self):
+        self._index: Dict[str, set] = {}
+        self._grams: Dict[str, set] = {}
+
+    def add(self, key: str, name: str) -> None:
+        self.remove(key)
+        grams = _trigrams(normalize_company_name(name))
+        self._grams[key] = grams
+        for g in grams:
+            self._index.setdefault(g, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        for g in self._grams.pop(key, ()):
+            ids = self._index.get(g)
+            if ids:
+                ids.discard(key)
+                if not ids:
+                    del self._index[g]
+
+    def search(self, query: str, min_score: float = 0.0) -> List[Tuple[float, str]]:
+        """Score ids by trigram overlap with the query (see _overlap_score). Best first."""
+        qgrams = _trigrams(normalize_company_name(query))
+        if not qgrams:
+            return []
+        shared: Counter = Counter()
+        for g in qgrams:
+            for key in self._index.get(g, ()):
+                shared[key] += 1
+        scored = []
+        for key, n in shared.items():
+            score = _overlap_score(n, len(qgrams), len(self._grams.get(key, ())))
+            if score >= min_score:
+                scored.append((score, key))
+        scored.sort(key=lambda x: -x[0])
+        return scored
+
+class FuzzyNameIndex:
+    """
+    Company name (as typed by users or seen on FSSC pages) -> COID. Exact lookups on the
+    normalized name plus trigram near-match search; replaces the old exact-only dict.
+    """
+
+    def __init__(self):
+        self._coids: Dict[str, str] = {}
+        self._trigrams = TrigramIndex()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, coid: str) -> None:
+        norm = normalize_company_name(name)
+        if not norm or not coid:
+            return
+        with self._lock:
+            self._coids[norm] = coid
+            self._trigrams.add(norm, norm)
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            return self._coids.get(normalize_company_name(name))
+
+    def search(self, name: str, min_score: float = 0.0) -> List[Tuple[float, str, str]]:
+        """[(score, coid, matched name)] best first."""
+        with self._lock:
+            return [(score, self._coids[norm], norm) for score, norm in self._trigrams.search(name, min_score)]
+
+fssc_name_index = FuzzyNameIndex()
+
+class FsscRegisterMirror:
+    """
+    Incremental local copy of FSSC public-register organizations (COID -> record), persisted
+    as JSON and indexed in memory by company-name trigrams. Fed by every detail page and
+    search we fetch plus the background crawl job; thread-safe (fetchers run in to_thread).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.meta: Dict[str, Any] = {}
+        self._trigrams = TrigramIndex()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                db = json.load(f)
+        except Exception as e:
+            logger.exception("FSSC mirror load error: %s", e)
+            return
+        with self._lock:
+            self.meta = db.get("meta", {})
+            for coid, rec in db.get("orgs", {}).items():
+                self._add_locked(coid, rec)
+            self._dirty = False
+        logger.info("FSSC mirror loaded: %d organizations", len(self.records))
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            db = {"meta": dict(self.meta), "orgs": dict(self.records)}
+            self._dirty = False
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(db, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _add_locked(self, coid: str, rec: Dict[str, Any]) -> None:
+        old = self.records.get(coid)
+        if old:
+            rec = {**old, **{k: v for k, v in rec.items() if v}}
+        self.records[coid] = rec
+        self._trigrams.add(coid, rec.get("organization", ""))
+        self._dirty = True
+
+    def add(self, coid: Optional[str], organization: Optional[str], **fields: Any) -> None:
+        if not coid or not organization:
+            return
+        rec = {"organization": organization.strip(), "seen_at": int(time.time()), **fields}
+        with self._lock:
+            self._add_locked(coid.strip(), rec)
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.0) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Rank organizations by company-name similarity; [(score, coid, record)] best first."""
+        with self._lock:
+            scored = [(score, coid, dict(self.records[coid])) for score, coid in self._trigrams.search(query, min_score)]
+        scored.sort(key=lambda x: (-x[0], x[2].get("organization", "")))
+        return scored[:limit]
+
+fssc_mirror = FsscRegisterMirror(FSSC_MIRROR_FILE)
+
+def fetch_fssc_search_html(query: str) -> Optional[str]:
+    """GET the FSSC public-register search page for a query; None on request errors."""
     headers = {
         "User-Agent": "Mozilla/5.0 (compatible; CertCheckBot/1.0)",
         "Accept-Language": "en-US,en;q=0.9",
     }
     try:
-        q_enc = requests.utils.quote(company_name)
+        q_enc = requests.utils.quote(query)
         url = f"https://www.fssc.com/public-register/?search={q_enc}"
-        r = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        html_text = r.text or ""
+        r = http_session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        return r.text or ""
+    except UpstreamBusy:
+        raise
     except Exception as e:
-        logger.exception("find_coid_by_company_name: request error: %s", e)
+        logger.exception("FSSC search request error: %s", e)
+        return None
+
+def _search_card_country(card) -> Optional[str]:
+    if card is None:
         return None
-    # 1) raw COID text
+    el = card.select_one('[class*="country"]')
+    if el and el.get_text(strip=True):
+        return el.get_text(" ", strip=True)
+    m = re.search(r"Country\s*[:\-]\s*([^\n|]+)", card.get_text("\n", strip=True), re.I)
+    return m.group(1).strip() if m else None
+
+def parse_fssc_search_results(html_text: str) -> List[Dict[str, Optional[str]]]:
+    """
+    Extract organizations listed on an FSSC search results page as
+    [{"coid", "organization", "country"}] (in page order, de-duplicated by COID).
+    """
+    soup = BeautifulSoup(html_text or "", "html.parser")
+    out: Dict[str, Dict[str, Optional[str]]] = {}
+    for span in soup.select("span.co-id"):
+        m = re.search(r"COID\s*[:\-]?\s*([A-Za-z0-9\-]+)", span.get_text(" ", strip=True), re.I)
+        if not m:
+            continue
+        card = span.find_parent(["article", "li", "tr"]) or span.parent
+        title = card.find(["h2", "h3", "h4", "h5", "a"]) if card else None
+        name = title.get_text(" ", strip=True) if title else None
+        out.setdefault(m.group(1), {"coid": m.group(1), "organization": name, "country": _search_card_country(card)})
+    if not out:
+        for a in soup.select('a[href*="/public-register/"]'):
+            m = re.search(r"/public-register/([A-Za-z0-9]+-[A-Za-z0-9\-]+)/?", a.get("href", ""))
+            name = a.get_text(" ", strip=True)
+            if m and name:
+                out.setdefault(m.group(1), {"coid": m.group(1), "organization": name, "country": None})
+    return list(out.values())
+
+def _fssc_search_fallback_coid(html_text: str) -> Optional[str]:
+    """
+    COID on a search page that lists no parseable organization:
+      1) text like "COID: AFG-1-7798-696622" in the raw html (case-insensitive)
+      2) the text of <span class="co-id">
+      3) an href like /public-register/<coid>
+    """
     m = re.search(r"COID\s*[:\-]?\s*([A-Za-z0-9\-]+)", html_text, re.I)
     if m:
-        coid = m.group(1).strip()
-        idx[name_key] = coid
-        cache_set("fssc_name_index", idx)
-        logger.info("find_coid_by_company_name: found COID (raw text) %s for %s", coid, name_key)
-        return coid
-    # 2) span.co-id
-    try:
-        soup = BeautifulSoup(html_text, "html.parser")
-        span = soup.select_one("span.co-id")
-        if span:
-            txt = span.get_text(" ", strip=True)
-            m2 = re.search(r"COID\s*[:\-]?\s*([A-Za-z0-9\-]+)", txt, re.I)
-            if m2:
-                coid = m2.group(1).strip()
-                idx[name_key] = coid
-                cache_set("fssc_name_index", idx)
-                logger.info("find_coid_by_company_name: found COID (span) %s for %s", coid, name_key)
-                return coid
-    except Exception:
-        pass
-    # 3) fallback: href /public-register/<coid>
-    m3 = re.search(r"/public-register/([A-Za-z0-9\-]+)/?", html_text, re.I)
-    if m3:
-        coid = m3.group(1).strip()
-        idx[name_key] = coid
-        cache_set("fssc_name_index", idx)
-        logger.info("find_coid_by_company_name: found COID (href) %s for %s", coid, name_key)
-        return coid
-    logger.info("find_coid_by_company_name: no COID found for %s", name_key)
-    return None
+        return m.group(1).strip()
+    span = BeautifulSoup(html_text, "html.parser").select_one("span.co-id")
+    if span:
+        m = re.search(r"COID\s*[:\-]?\s*([A-Za-z0-9\-]+)", span.get_text(" ", strip=True), re.I)
+        if m:
+            return m.group(1).strip()
+    m = re.search(r"/public-register/([A-Za-z0-9\-]+)/?", html_text, re.I)
+    return m.group(1).strip() if m else None
+
+def parse_fssc_search_page(html_text: str) -> Tuple[List[Dict[str, Optional[str]]], Optional[str]]:
+    """
+    FSSC search page -> (listed organizations as parse_fssc_search_results, fallback COID from
+    _fssc_search_fallback_coid when none is listed) (pure; runs in a parser process).
+    """
+    found = parse_fssc_search_results(html_text)
+    return found, None if found else _fssc_search_fallback_coid(html_text or "")
+
+async def crawl_fssc_register(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    JobQueue callback: search the next FSSC_CRAWL_PER_RUN seed terms (round-robin cursor kept
+    in the mirror meta), add every listed organization to the mirror and persist it.
+    """
+    with background_priority():
+        for i in range(FSSC_CRAWL_PER_RUN):
+            cursor = int(fssc_mirror.meta.get("crawl_cursor", 0)) % len(FSSC_CRAWL_TERMS)
+            term = FSSC_CRAWL_TERMS[cursor]
+            if i:
+                await asyncio.sleep(FSSC_CRAWL_DELAY)
+            try:
+                html_text = await asyncio.to_thread(fetch_fssc_search_html, term)
+            except UpstreamBusy as e:
+                logger.info("FSSC crawl paused: %s", e)
+                break
+            if html_text is not None:
+                found = await asyncio.to_thread(run_parser, parse_fssc_search_results, html_text)
+                for c in found:
+                    fssc_mirror.add(c["coid"], c.get("organization"), country=c.get("country"))
+                logger.info("FSSC crawl %r: %d organizations", term, len(found))
+            fssc_mirror.meta["crawl_cursor"] = cursor + 1
+    await asyncio.to_thread(fssc_mirror.save)
+
+async def save_fssc_mirror(context: ContextTypes.DEFAULT_TYPE) -> None:
+    await asyncio.to_thread(fssc_mirror.save)
+
+# ---------------- New helper: find COID by company name on FSSC ----------------
+def find_fssc_name_candidates(company_name: str, limit: int = FSSC_PICK_MAX) -> List[Dict[str, Any]]:
+    """
+    Near-matches for a company name from the local indexes (names already resolved and the
+    register mirror), scored >= FSSC_FUZZY_THRESHOLD: [{"coid", "organization", "score"}] best first.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for score, coid, name in fssc_name_index.search(company_name, FSSC_FUZZY_THRESHOLD):
+        merged[coid] = {"coid": coid, "organization": name.upper(), "score": score}
+    for score, coid, rec in fssc_mirror.search(company_name, limit=limit, min_score=FSSC_FUZZY_THRESHOLD):
+        prev = merged.get(coid)
+        merged[coid] = {"coid": coid, "organization": rec.get("organization") or (prev or {}).get("organization"),
+                        "country": rec.get("country"), "score": max(score, prev["score"]) if prev else score}
+    return sorted(merged.values(), key=lambda c: -c["score"])[:limit]
+
+def _is_confident(candidates: List[Dict[str, Any]]) -> bool:
+    """Top candidate is a strong match and clearly ahead of the runner-up."""
+    if not candidates or candidates[0]["score"] < FSSC_MIRROR_MIN_SCORE:
+        return False
+    return len(candidates) == 1 or candidates[0]["score"] - candidates[1]["score"] >= FSSC_AMBIGUITY_MARGIN
+
+def resolve_fssc_company(company_name: str, picks: Optional[Dict[str, str]] = None) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Resolve a company name to a COID without bothering fssc.com when possible.
+    Returns (coid, []) for the user's own earlier pick (picks, Conversation.fssc_picks), an exact
+    or a confident match, (None, candidates) when there are only near-matches (local first,
+    then the ranked fssc.com search; the user should pick), otherwise the result of the legacy
+    live search as (coid or None, []).
+    """
+    if not company_name:
+        return None, []
+    coid = (picks or {}).get(normalize_company_name(company_name)) or fssc_name_index.get(company_name)
+    if coid:
+        return coid, []
+    candidates = find_fssc_name_candidates(company_name)
+    if _is_confident(candidates):
+        top = candidates[0]
+        logger.info("resolve_fssc_company: local match %s (%s, score %.2f) for %r", top["coid"], top["organization"], top["score"], company_name)
+        fssc_name_index.add(company_name, top["coid"])
+        return top["coid"], []
+    if candidates:
+        return None, candidates
+    candidates = search_fssc_candidates_live(company_name)
+    if _is_confident(candidates):
+        fssc_name_index.add(company_name, candidates[0]["coid"])
+        return candidates[0]["coid"], []
+    if candidates:
+        return None, candidates
+    return find_coid_by_company_name_live(company_name), []
+
+def fssc_live_search(company_name: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One fssc.com search for a company name -> (listed organizations ranked by name similarity
+    to the query: [{"coid", "organization", "country", "score", "live"}] best first, page order
+    breaking ties; fallback COID when the page lists none, see parse_fssc_search_page).
+    Cached per normalized query (empty answers for NEGATIVE_TTL); all results feed the register mirror.
+    """
+    key = f"fsscsearch:{normalize_company_name(company_name)}"
+    cached = cache_get(key)
+    if cached is not None:
+        return cached
+    html_text = fetch_fssc_search_html(company_name)
+    if html_text is None:
+        return [], None
+    found, coid = run_parser(parse_fssc_search_page, html_text)
+    for c in found:
+        fssc_mirror.add(c["coid"], c.get("organization"), country=c.get("country"))
+        c["score"] = name_similarity(company_name, c.get("organization") or "")
+        c["live"] = True
+    ranked = sorted(found, key=lambda c: -c["score"])
+    cache_set(key, (ranked, coid), None if ranked or coid else NEGATIVE_TTL)
+    return ranked, coid
+
+_fssc_pick_votes: Dict[str, Dict[str, set]] = {}   # normalized name -> COID -> user ids (event loop only)
+
+def record_fssc_pick(picks: Dict[str, str], user_id: int, company_name: str, coid: str) -> None:
+    """
+    A user chose coid from the candidates for company_name: answered directly for that user from
+    now on (picks, their Conversation.fssc_picks). The shared fssc_name_index only learns the
+    mapping once FSSC_PICK_AGREEMENT different users made the same choice, so one wrong click
+    does not answer the name for everybody.
+    """
+    norm = normalize_company_name(company_name)
+    if not norm or not coid:
+        return
+    picks[norm] = coid
+    votes = _fssc_pick_votes.setdefault(norm, {})
+    voters = votes.setdefault(coid, set())
+    voters.add(user_id)
+    if len(voters) >= FSSC_PICK_AGREEMENT:
+        logger.info("record_fssc_pick: %d users picked %s for %r, answering it for everyone", len(voters), coid, norm)
+        fssc_name_index.add(company_name, coid)
+        _fssc_pick_votes.pop(norm, None)
+    elif len(_fssc_pick_votes) > FSSC_PICK_VOTES_MAX:
+        _fssc_pick_votes.pop(next(iter(_fssc_pick_votes)))
+
+def search_fssc_candidates_live(company_name: str, limit: int = FSSC_PICK_MAX) -> List[Dict[str, Any]]:
+    """Ranked organizations of the live fssc.com search (fssc_live_search), best first."""
+    return fssc_live_search(company_name)[0][:limit]
+
+async def prefetch_fssc_details(coids: List[str]) -> None:
+    """Fetch FSSC detail pages concurrently so a candidate pick is served from cache."""
+    with background_priority():
+        results = await asyncio.gather(*(run_fetcher("fssc", fetch_fssc_by_coid, c) for c in coids), return_exceptions=True)
+    for coid, r in zip(coids, results):
+        if isinstance(r, Exception):
+            logger.info("FSSC prefetch of %s failed: %s", coid, r)
+
+def find_coid_by_company_name_live(company_name: str) -> Optional[str]:
+    """
+    COID for a company name from the live fssc.com search, skipping the local indexes: the
+    best-ranked listed organization, else the page's fallback COID (fssc_live_search, one
+    request shared with search_fssc_candidates_live). Caches the mapping in fssc_name_index.
+    """
+    name_key = normalize_company_name(company_name)
+    candidates, coid = fssc_live_search(company_name)
+    if candidates:
+        coid = candidates[0]["coid"]
+        logger.info("find_coid_by_company_name_live: best-ranked COID %s (%s, score %.2f) for %s",
+                    coid, candidates[0].get("organization"), candidates[0]["score"], name_key)
+    elif coid:
+        logger.info("find_coid_by_company_name_live: found COID (page fallback) %s for %s", coid, name_key)
+    else:
+        logger.info("find_coid_by_company_name_live: no COID found for %s", name_key)
+        return None
+    fssc_name_index.add(company_name, coid)
+    return coid
+
+# ---------------- Verification result model ----------------
+@dataclass(slots=True)
+class VerificationResult:
+    """
+    Structured outcome of one verification. Cached as-is (not as rendered HTML) and
+    rendered lazily per output channel via render(fmt); each format is rendered once.
+    status: 'found' | 'not_found' | 'error' | 'input' (more input needed, see note)
+            | 'busy' (the body's fetch queue was full; try again later).
+            A not_found note is the body's own message (CertBody.not_found).
+    cb: body whose data matched (for the fallback chain: the body that answered).
+    stale: served from the last good result while the live check is slow or failing;
+           refresh is that live check (see edit_when_refreshed).
+    """
+    cb: str
+    status: str
+    data: Optional[Dict[str, Any]] = None
+    source: str = "Unknown"
+    ab: str = "Not provided"
+    error: Optional[str] = None
+    note: Optional[str] = None
+    checked_at: float = field(default_factory=time.time)
+    stale: bool = False
+    refresh: Optional["asyncio.Task"] = field(default=None, repr=False, compare=False)
+    _rendered: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "found"
+
+    @property
+    def meta(self) -> Dict[str, str]:
+        return {"cb": self.source, "ab": self.ab}
+
+    def render(self, fmt: str = "html") -> Any:
+        """Render as 'html' (Telegram message), 'text' (plain lines) or 'json' (dict)."""
+        out = self._rendered.get(fmt)
+        if out is None:
+            out = RESULT_RENDERERS[fmt](self)
+            self._rendered[fmt] = out
+        return out
+
+def _render_html(res: VerificationResult) -> str:
+    if res.status == "found":
+        out = CERT_BODIES[res.cb].format(res.data)
+        if res.stale:
+            out += "\n\n" + STALE_NOTE.format(checked=time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(res.checked_at)))
+        return out
+    if res.status == "error":
+        return ERROR_MSG + ("\n\n" + html.escape(res.error) if res.error else "")
+    if res.status == "input":
+        return res.note or ""
+    if res.status == "busy":
+        return BUSY_MSG
+    return html.escape(res.note) if res.note else NOT_FOUND
+
+def _render_text(res: VerificationResult) -> str:
+    return "\n".join(html_to_lines(res.render("html")))
+
+def _render_json(res: VerificationResult) -> Dict[str, Any]:
+    return {
+        "cb": res.cb,
+        "result": res.status,
+        "ok": res.ok,
+        "source": res.source,
+        "accreditation_body": res.ab,
+        "data": res.data,
+        "error": res.error,
+        "note": res.note,
+        "checked_at": int(res.checked_at),
+        "stale": res.stale,
+    }
+
+RESULT_RENDERERS = {"html": _render_html, "text": _render_text, "json": _render_json}
+
+# ---------------- certification-body adapters ----------------
+# One CertBody per certification body declares everything body-specific: what the chat flow
+# asks for, how the upstream is fetched and its answer read, how a result is formatted, result
+# cache lifetime and fetch-pool size. The engine (run_fetcher, verify_certificate, the chat flow,
+# bulk / inline / API) reads only CERT_BODIES, so adding a body is one entry below.
+INPUT_NAMES = {"coid": "COID", "cert_no": "certificate number", "issue_date": "issue date", "company": "company name"}
+INPUT_PROMPTS = {
+    "coid": PROMPT_COID,
+    "cert_no": PROMPT_CERT_NO,
+    "issue_date": PROMPT_ISSUE_DATE_TEXT,
+    "company": "Please enter the *company name* to search:",
+}
+# typed text -> input value, None when it has to be asked again (identifiers are canonicalized later)
+INPUT_PARSERS = {
+    "coid": lambda s: s.strip() or None,
+    "cert_no": lambda s: s.strip() or None,
+    "issue_date": validate_date_input,
+    "company": lambda s: s.strip().upper() or None,
+}
+INPUT_INVALID = {
+    "issue_date": "Date format not recognized. Please use `YYYY-MM-DD` or `DD/MM/YYYY`. Example: 2025-10-10",
+}
+
+@dataclass(frozen=True, slots=True)
+class CertBody:
+    """
+    inputs: asked for in this order. The identifier is "coid" or "cert_no"; the other input
+            (issue date, company) is the lookup's extra argument (part of the cache key).
+    fetch: blocking fetcher run on the body's pool as fetch(ident, extra) for bodies with an
+           extra input, else fetch(ident, force).
+    parse: fetcher answer -> (status, data, detail): 'found' (detail: accreditation body),
+           'not_found', or 'error' (detail: message).
+    chain: bodies queried instead of fetch (in parallel; the first in this order that finds wins).
+    """
+    key: str
+    source: str
+    label: Optional[str] = None             # button on the body keyboard (None: reached another way)
+    title: Optional[str] = None             # "You selected *<title>*." above the first prompt
+    inputs: Tuple[str, ...] = ("cert_no",)
+    extra_required: bool = True
+    prompts: Dict[str, str] = field(default_factory=dict)   # per-input overrides of INPUT_PROMPTS
+    fetch: Optional[Callable[..., Any]] = None
+    parse: Optional[Callable[[Any], Tuple[str, Any, Optional[str]]]] = None
+    format: Optional[Callable[[Dict[str, Any]], str]] = None
+    not_found: Optional[str] = None         # "not found" message with {ident} (default NOT_FOUND)
+    chain: Tuple[str, ...] = ()
+    canonical: Optional[Callable[[str], str]] = _canonical_cert_no
+    aliases: Tuple[str, ...] = ()           # extra names accepted by /verify, inline mode, bulk and the API
+    quick: bool = True                      # offered by /verify, inline mode, bulk upload and the API
+    cache_prefix: Optional[str] = None      # runtime-cache prefix of the fetcher's own (and negative) entries
+    cache_ttl: float = CACHE_TTL            # verification results
+    section_end: Optional[Callable[[Any], bool]] = None    # streamed page fetch stops after this element
+    workers: int = 2
+    queue_limit: int = 6
+    bulk_limit: int = 2                     # bulk lookups in flight (across uploads)
+
+    @property
+    def extra(self) -> Optional[str]:
+        return next((i for i in self.inputs if i not in ("coid", "cert_no")), None)
+
+    def missing_extra(self, extra: Optional[str]) -> bool:
+        return bool(self.extra and self.extra_required and not extra)
+
+    def split_inputs(self, values: Dict[str, str]) -> Tuple[str, Optional[str]]:
+        """Collected inputs -> (identifier, extra)."""
+        return values.get("coid") or values.get("cert_no"), values.get(self.extra) if self.extra else None
+
+    def fetch_args(self, ident: str, extra: Optional[str], force: bool) -> Tuple:
+        return (ident, extra) if self.extra else (ident, force)
+
+    def prompt(self, name: str, first: bool = False) -> str:
+        text = self.prompts.get(name) or INPUT_PROMPTS[name]
+        return f"You selected *{self.title}*.\n\n{text}" if first and self.title else text
+
+def _parse_fssc(res) -> Tuple[str, Any, Optional[str]]:
+    if isinstance(res, dict) and res.get("error"):
+        return "error", None, res["error"]
+    if not res or res == "not_found":
+        return "not_found", None, None
+    return "found", res, "FSSC / Not provided"
+
+def _parse_infinity(res) -> Tuple[str, Any, Optional[str]]:
+    if isinstance(res, dict) and res.get("error"):
+        return "error", None, res["error"]
+    return ("found", res, res.get("dob")) if res else ("not_found", None, None)
+
+def _parse_qsi(parsed) -> Tuple[str, Any, Optional[str]]:
+    if isinstance(parsed, dict) and parsed.get("error"):
+        return "error", None, parsed["error"]
+    if parsed and any(parsed.get(k) for k in ("name", "certificate_id", "standard")):
+        return "found", parsed, parsed.get("accreditation") or parsed.get("accreditation_body")
+    return "not_found", None, None
+
+def _parse_qro(answer) -> Tuple[str, Any, Optional[str]]:
+    ok, parsed = answer
+    if ok and parsed and any(parsed.get(k) for k in ("company", "status", "standard", "issue_date")):
+        return "found", parsed, parsed.get("accreditation") or parsed.get("accreditation_body")
+    if not ok and parsed and parsed.get("error"):
+        return "error", None, parsed["error"]
+    return "not_found", None, None
+
+def _parse_sisbel(reply) -> Tuple[str, Any, Optional[str]]:
+    if isinstance(reply, dict) and reply.get("error"):
+        return "error", None, reply["error"]
+    if isinstance(reply, dict) and reply.get("success") and isinstance(reply.get("data"), dict):
+        return "found", reply["data"], None
+    return "not_found", None, None
+
+# registry order is the order of the body keyboard
+CERT_BODIES: Dict[str, CertBody] = {b.key: b for b in (
+    CertBody("qro_org", "QRO Certification (qrocert.org)", label="QRO | IAF", title="QRO",
+             inputs=("cert_no", "issue_date"), fetch=submit_qro_org, parse=_parse_qro,
+             format=lambda d: "<b>Source: qrocert.org</b>\n\n" + (format_qro(d) or ""),
+             aliases=("qrocertorg", "qroiaf")),
+    CertBody("qro_com", "QRO Certification (qrocert.com)", label="QRO | UKAF", title="QRO",
+             inputs=("cert_no", "issue_date"), fetch=submit_qro_com, parse=_parse_qro,
+             format=lambda d: "<b>Source: qrocert.com</b>\n\n" + (format_qro(d) or ""),
+             aliases=("qrocertcom", "qroukaf")),
+    CertBody("qsi", "QSI (qsicert.ca)", label="QSI Cert Canada", title="QSI",
+             prompts={"cert_no": "Please provide the certificate ID exactly as it is printed on your certificate."},
+             fetch=fetch_qsi_simple, parse=_parse_qsi,
+             format=lambda d: format_qsi_simple(d) or "Found (QSI) but unable to format.",
+             aliases=("qsicert", "qsicertcanada"), cache_prefix="qsi"),
+    CertBody("infinity", "Infinity Cert International", label="Infinity ICI", title="Infinity",
+             fetch=infinity_post_cert, parse=_parse_infinity,
+             format=lambda d: format_infty(d) or "Found (Infinity) but unable to format.",
+             aliases=("infinityici", "ici", "infty"), cache_prefix="infty", workers=4, queue_limit=16, bulk_limit=3),
+    CertBody("sisbel", "SISBEL (q.sisbel.com)", label="SiSBEL", title="SISBEL",
+             inputs=("company", "cert_no"), prompts={"cert_no": "Now enter the *certificate number*:"},
+             fetch=fetch_sisbel, parse=_parse_sisbel, format=lambda d: format_sisbel(d) or NOT_FOUND,
+             canonical=None, quick=False),
+    CertBody("fssc", "FSSC Public Register", inputs=("coid",),
+             fetch=fetch_fssc_by_coid, parse=_parse_fssc, format=lambda d: format_fssc_result(d) or NOT_FOUND,
+             not_found="❌ No certificate found for COID: {ident}",
+             canonical=_canonical_coid, aliases=("fssc22000", "fssc24000", "coid"), cache_prefix="fssc",
+             section_end=_fssc_section_end, workers=4, queue_limit=16, bulk_limit=3),
+    CertBody("other", "Other / Fallback chain", title="Other / Auto-Fallback",
+             inputs=("cert_no", "issue_date"), extra_required=False,
+             chain=("infinity", "qsi", "qro_com", "qro_org", "fssc"), aliases=("auto",)),
+)}
+
+# user-typed certification body names -> CERT_BODIES keys (alphanumerics-only, lowercase)
+CB_ALIASES = {re.sub(r"[^a-z0-9]", "", name): b.key for b in CERT_BODIES.values() for name in (b.key,) + b.aliases}
+# bodies accepted by /verify, inline mode, bulk upload and the API (for help texts)
+QUICK_BODIES = [k for k, b in CERT_BODIES.items() if b.quick]
 
 # ---------------- Dispatcher / verification core ----------------
-async def verify_for_cb(cb: str, cert_no: str, issue_date_qro: Optional[str]) -> Tuple[str, bool, Dict[str, str]]:
-    meta = {"cb": "Unknown", "ab": "Not provided"}
-
-    if cb == "infinity":
-        inf = await asyncio.to_thread(infinity_post_cert, cert_no)
-        meta["cb"] = "Infinity Cert International"
-        if inf:
-            ab = inf.get("dob") if isinstance(inf, dict) else None
-            meta["ab"] = ab or "Not provided"
-            return (format_infty(inf) or "Found (Infinity) but unable to format.", True, meta)
-        return (NOT_FOUND, False, meta)
-
-    if cb == "qsi":
-        parsed = await asyncio.to_thread(fetch_qsi_simple, cert_no)
-        meta["cb"] = "QSI (qsicert.ca)"
-        if isinstance(parsed, dict) and parsed.get("error"):
-            return (ERROR_MSG + f"\n\n{parsed.get('error')}", False, meta)
-        if parsed and any(parsed.get(k) for k in ("name", "certificate_id", "standard")):
-            ab = parsed.get("accreditation") or parsed.get("accreditation_body") or "Not provided"
-            meta["ab"] = ab
-            return (format_qsi_simple(parsed) or "Found (QSI) but unable to format.", True, meta)
-        return (NOT_FOUND, False, meta)
-
-    if cb == "qro_com":
-        meta["cb"] = "QRO Certification (qrocert.com)"
-        if not issue_date_qro:
-            return ("QRO (qrocert.com) requires an issue date. Please provide it in `YYYY-MM-DD` or `DD/MM/YYYY` format.", False, meta)
-        ok, parsed = await asyncio.get_event_loop().run_in_executor(None, submit_qro_com, cert_no, issue_date_qro)
-        if ok and any(parsed.get(k) for k in ("company", "status", "standard", "issue_date")):
-            ab = parsed.get("accreditation") or parsed.get("accreditation_body") or "Not provided"
-            meta["ab"] = ab
-            return ("<b>Source: qrocert.com</b>\n\n" + (format_qro(parsed) or ""), True, meta)
-        if not ok and parsed and parsed.get("error"):
-            return (ERROR_MSG + "\n\n" + parsed.get("error"), False, meta)
-        return (NOT_FOUND, False, meta)
-
-    if cb == "qro_org":
-        meta["cb"] = "QRO Certification (qrocert.org)"
-        if not issue_date_qro:
-            return ("QRO (qrocert.org) requires an issue date. Please provide it in `YYYY-MM-DD` or `DD/MM/YYYY` format.", False, meta)
-        ok, parsed = await asyncio.get_event_loop().run_in_executor(None, submit_qro_org, cert_no, issue_date_qro)
-        if ok and any(parsed.get(k) for k in ("company", "status", "standard", "issue_date")):
-            ab = parsed.get("accreditation") or parsed.get("accreditation_body") or "Not provided"
-            meta["ab"] = ab
-            return ("<b>Source: qrocert.org</b>\n\n" + (format_qro(parsed) or ""), True, meta)
-        if not ok and parsed and parsed.get("error"):
-            return (ERROR_MSG + "\n\n" + parsed.get("error"), False, meta)
-        return (NOT_FOUND, False, meta)
-
-    if cb == "fssc":
-        meta["cb"] = "FSSC Public Register"
-        res = await asyncio.to_thread(fetch_fssc_by_coid, cert_no)
-        if isinstance(res, dict) and res.get("error"):
-            return (ERROR_MSG + "\n\n" + html.escape(res.get('error')), False, meta)
-        if res == "not_found":
-            return (NOT_FOUND, False, meta)
-        meta["ab"] = "FSSC / Not provided"
-        return (format_fssc_result(res) or NOT_FOUND, True, meta)
-
-    # fallback chain for 'other'
-    meta["cb"] = "Other / Fallback chain"
-    inf = await asyncio.to_thread(infinity_post_cert, cert_no)
-    if inf:
-        meta["cb"] = "Infinity Cert International"
-        meta["ab"] = inf.get("dob") or "Not provided"
-        return (format_infty(inf) or "Found (Infinity) but unable to format.", True, meta)
-
-    parsed_qsi = await asyncio.to_thread(fetch_qsi_simple, cert_no)
-    if isinstance(parsed_qsi, dict) and parsed_qsi.get("error"):
-        logger.info("QSI fallback error: %s", parsed_qsi.get("error"))
+# access frequency per (cb, cert_no, extra), decayed by refresh_hot_entries
+_access_counts: Counter = Counter()
+
+# last good result per key (stale-while-revalidate) and the live checks running behind them
+_refreshing: Dict[str, "asyncio.Task"] = {}
+# live lookups in flight without a last good result; concurrent callers for a key share one
+_inflight: Dict[str, "asyncio.Future"] = {}
+
+def _result_cache_key(cb: str, cert_no: str, extra: Optional[str]) -> str:
+    return f"vr:{cb}:{cert_no}:{extra or ''}"
+
+def _stale_cache_key(cb: str, cert_no: str, extra: Optional[str]) -> str:
+    return "last" + _result_cache_key(cb, cert_no, extra)
+
+def is_verification_cached(cb: str, cert_no: str, extra: Optional[str] = None) -> bool:
+    """True when verify_certificate(cb, cert_no, ...) can be answered from the runtime cache."""
+    cert_no = canonical_id(cb, cert_no)
+    if cache_get(_result_cache_key(cb, cert_no, extra)):
+        return True
+    prefix = CERT_BODIES[cb].cache_prefix if cb in CERT_BODIES else None
+    return bool(prefix and (cache_get(f"{prefix}:{cert_no}") or known_miss(cb, cert_no)))
+
+def _found(cb: str, data: Dict[str, Any], ab: Optional[str]) -> VerificationResult:
+    return VerificationResult(cb=cb, status="found", data=data, source=CERT_BODIES[cb].source, ab=ab or "Not provided")
+
+async def _lookup_body(body: CertBody, ident: str, extra: Optional[str], force: bool) -> VerificationResult:
+    """One upstream lookup: body.fetch on the body's pool, answer read with body.parse."""
+    raw = await run_fetcher(body.key, body.fetch, *body.fetch_args(ident, extra, force))
+    status, data, detail = body.parse(raw)
+    if status == "found":
+        return _found(body.key, data, detail)
+    if status == "error":
+        return VerificationResult(body.key, "error", source=body.source, error=detail)
+    return VerificationResult(body.key, "not_found", source=body.source,
+                              note=body.not_found.format(ident=ident) if body.not_found else None)
+
+def _drain(task: "asyncio.Task") -> None:
+    if not task.cancelled():
+        task.exception()
+
+async def _verify_chain(body: CertBody, ident: str, extra: Optional[str], force: bool) -> VerificationResult:
+    """
+    Fallback chain: every member that has its inputs is queried at once; the first member in
+    chain order that finds the certificate wins (slower members finish in the background and
+    warm their caches). Without a match the first failure in chain order is reported
+    (UpstreamBusy is re-raised), else not found.
+    """
+    async def lookup(member: CertBody) -> Tuple[VerificationResult, str]:
+        # a bulk row holds each member's bulk_limit slot for that member's lookup
+        async with _bulk_host_sem(member.key) if bulk_row.get() else nullcontext():
+            res = await _lookup_body(member, ident, extra, force)
+        return res, _cache_state.get()
+
+    members = [CERT_BODIES[k] for k in body.chain if not CERT_BODIES[k].missing_extra(extra)]
+    # the members not awaited below keep running after the answer; spawn_background holds them
+    # and _drain retrieves their exceptions
+    tasks = [spawn_background(lookup(m)) for m in members]
+    for task in tasks:
+        task.add_done_callback(_drain)
+    failure: Any = None
+    for member, task in zip(members, tasks):
+        try:
+            res, state = await task
+        except UpstreamBusy as e:
+            failure = failure or e
+            continue
+        if res.ok:
+            _cache_state.set(state)
+            return res
+        if res.status == "error":
+            logger.info("%s fallback error: %s", member.key, res.error)
+            failure = failure or VerificationResult(body.key, "error", source=body.source, error=res.error)
+    if isinstance(failure, UpstreamBusy):
+        raise failure
+    return failure or VerificationResult(body.key, "not_found", source=body.source)
+
+async def _verify_uncached(cb: str, cert_no: str, extra: Optional[str], force: bool = False) -> VerificationResult:
+    body = CERT_BODIES.get(cb) or CERT_BODIES["other"]
+    if body.missing_extra(extra):
+        return VerificationResult(cb, "input", source=body.source,
+                                  note=f"{body.source} requires the {INPUT_NAMES[body.extra]}. "
+                                  + INPUT_PROMPTS[body.extra].strip())
+    if body.chain:
+        return await _verify_chain(body, cert_no, extra, force)
+    return await _lookup_body(body, cert_no, extra, force)
+
+async def _verify_live(cb: str, cert_no: str, extra: Optional[str], force: bool = False) -> VerificationResult:
+    """Upstream verification; updates the result cache (CertBody.cache_ttl) and the last good result."""
+    body = CERT_BODIES.get(cb) or CERT_BODIES["other"]
+    key = _result_cache_key(cb, cert_no, extra)
+    try:
+        res = await _verify_uncached(cb, cert_no, extra, force)
+    except UpstreamBusy as e:
+        res = VerificationResult(cb, "busy", source=CERT_BODIES.get(e.cb, body).source)
+    metrics.inc("taj_verifications_total", cb=cb, status=res.status)
+    if res.ok:
+        cache_set(key, res, ttl=body.cache_ttl)
+        cache_set(_stale_cache_key(cb, cert_no, extra), res, ttl=STALE_MAX_AGE)
+    elif res.status == "not_found":
+        # certificate withdrawn / removed upstream: stop serving the old positive result
+        cache_delete(_stale_cache_key(cb, cert_no, extra))
+        if force:
+            cache_delete(key)
+            if body.cache_prefix:
+                cache_delete(f"{body.cache_prefix}:{cert_no}")
+    return res
+
+async def _verify_live_once(cb: str, cert_no: str, extra: Optional[str]) -> VerificationResult:
+    """
+    Single-flight _verify_live: the first caller for a key runs the lookup, concurrent callers
+    (and callers arriving while a stale-while-revalidate check runs) wait for its result.
+    """
+    key = _result_cache_key(cb, cert_no, extra)
+    pending = _refreshing.get(key) or _inflight.get(key)
+    if pending is not None:
+        metrics.inc("taj_singleflight_joined_total", cb=cb)
+        res = await asyncio.shield(pending)
+        _cache_state.set("hit")
+        return res
+    fut = _inflight[key] = asyncio.get_running_loop().create_future()
+    fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+    try:
+        res = await _verify_live(cb, cert_no, extra)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        raise
     else:
-        if parsed_qsi and any(parsed_qsi.get(k) for k in ("name", "certificate_id", "standard")):
-            meta["cb"] = "QSI (qsicert.ca)"
-            meta["ab"] = parsed_qsi.get("accreditation") or "Not provided"
-            return (format_qsi_simple(parsed_qsi) or "Found (QSI) but unable to format.", True, meta)
-
-    if issue_date_qro:
-        ok, p = await asyncio.get_event_loop().run_in_executor(None, submit_qro_com, cert_no, issue_date_qro)
-        if ok and any(p.get(k) for k in ("company", "status", "standard", "issue_date")):
-            meta["cb"] = "QRO Certification (qrocert.com)"
-            meta["ab"] = p.get("accreditation") or "Not provided"
-            return ("<b>Source: qrocert.com</b>\n\n" + (format_qro(p) or ""), True, meta)
-        ok2, p2 = await asyncio.get_event_loop().run_in_executor(None, submit_qro_org, cert_no, issue_date_qro)
-        if ok2 and any(p2.get(k) for k in ("company", "status", "standard", "issue_date")):
-            meta["cb"] = "QRO Certification (qrocert.org)"
-            meta["ab"] = p2.get("accreditation") or "Not provided"
-            return ("<b>Source: qrocert.org</b>\n\n" + (format_qro(p2) or ""), True, meta)
-
-    fssc_res = await asyncio.to_thread(fetch_fssc_by_coid, cert_no)
-    if isinstance(fssc_res, dict) and fssc_res.get("error"):
-        return (ERROR_MSG + "\n\n" + html.escape(fssc_res.get('error')), False, meta)
-    if fssc_res != "not_found":
-        meta["cb"] = "FSSC Public Register"
-        meta["ab"] = "FSSC / Not provided"
-        return (format_fssc_result(fssc_res) or NOT_FOUND, True, meta)
-
-    return (NOT_FOUND, False, meta)
+        fut.set_result(res)
+        return res
+    finally:
+        _inflight.pop(key, None)
+
+def _live_check(cb: str, cert_no: str, extra: Optional[str]) -> "asyncio.Task":
+    """The running live check for this key, started if needed (one per key while the upstream is slow)."""
+    key = _result_cache_key(cb, cert_no, extra)
+    task = _refreshing.get(key)
+    if task is None:
+        task = _refreshing[key] = asyncio.create_task(_verify_live(cb, cert_no, extra))
+        task.add_done_callback(functools.partial(_live_check_done, key))
+    return task
+
+def _live_check_done(key: str, task: "asyncio.Task") -> None:
+    _refreshing.pop(key, None)
+    if not task.cancelled() and task.exception():
+        logger.error("live check %s failed: %s", key, task.exception())
+
+async def verify_certificate(cb: str, cert_no: str, extra: Optional[str], force: bool = False) -> VerificationResult:
+    """
+    Verify against a certification body in CERT_BODIES (or the 'other' fallback chain); found
+    results are cached. extra is the body's second input (QRO issue date, SISBEL company).
+    force=True bypasses the cache reads (used by the hot-entry refresh job).
+    Concurrent lookups of one key share a single upstream check. If the certificate was verified
+    before and the live check takes longer than STALE_GRACE or fails, the last good result is
+    returned with stale=True; its refresh task keeps running.
+    cert_no is canonicalized for cb (canonical_id) before any lookup.
+    """
+    canon = canonical_id(cb, cert_no)
+    rewritten, cert_no = canon != cert_no, canon
+    key = _result_cache_key(cb, cert_no, extra)
+    if force:
+        return await _verify_live(cb, cert_no, extra, force=True)
+    _access_counts[(cb, cert_no, extra)] += 1
+    cached = cache_get(key)
+    metrics.inc("taj_cache_lookups_total", cb=cb, layer="result", result="hit" if cached else "miss")
+    if cached:
+        if rewritten:
+            metrics.inc("taj_canonical_hits_total", cb=cb, layer="result")
+        _cache_state.set("hit")
+        return cached
+    last_good = cache_get(_stale_cache_key(cb, cert_no, extra))
+    if last_good is None:
+        return await _verify_live_once(cb, cert_no, extra)
+    task = _live_check(cb, cert_no, extra)
+    try:
+        res = await asyncio.wait_for(asyncio.shield(task), STALE_GRACE)
+    except asyncio.TimeoutError:
+        metrics.inc("taj_stale_served_total", cb=cb, reason="slow")
+        return replace(last_good, stale=True, refresh=task, _rendered={})
+    except Exception:
+        metrics.inc("taj_stale_served_total", cb=cb, reason="error")
+        return replace(last_good, stale=True, _rendered={})
+    if res.status in ("error", "busy"):
+        metrics.inc("taj_stale_served_total", cb=cb, reason=res.status)
+        return replace(last_good, stale=True, _rendered={})
+    return res
+
+def edit_when_refreshed(res: VerificationResult, message: Optional[Message], **kwargs) -> None:
+    """For a stale result sent as message: edit it if the background live check finds something different."""
+    if not res.stale or res.refresh is None or message is None:
+        return
+
+    async def _edit() -> None:
+        try:
+            fresh = await res.refresh
+        except Exception as e:
+            logger.info("background refresh of %s failed: %s", res.cb, e)
+            return
+        if fresh.status not in ("found", "not_found") or (fresh.status == res.status and fresh.data == res.data):
+            return
+        metrics.inc("taj_stale_edits_total", cb=res.cb)
+        await safe_send_text(message.edit_text, fresh.render("html") or NOT_FOUND, **kwargs)
+
+    spawn_background(_edit())
 
 # ---------------- Telegram handlers (Main Menu + flows) ----------------
 async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -863,7 +2470,8 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     /start: initiate captcha if user not verified, otherwise show main menu.
     """
     # If user is already verified (from previous /start), just show main menu.
-    if context.user_data.get("verified"):
+    conv = conversation(context.user_data)
+    if conv.verified:
         try:
             await update.message.reply_text("✅ You are already verified. Welcome!", parse_mode=ParseMode.MARKDOWN)
             await update.message.reply_text(MAIN_MENU_TEXT, parse_mode=ParseMode.MARKDOWN, reply_markup=MAIN_MENU_KB)
@@ -873,7 +2481,7 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
     # Not verified: start captcha
-    q_text, _ = start_captcha_for_user(context.user_data)
+    q_text = conv.start_captcha()
     try:
         # Present captcha question and instruct the user to reply with the numeric answer.
         await update.message.reply_text(
@@ -896,12 +2504,9 @@ async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     _, action = data.split(":", 1)
 
     # If not verified yet, show (or re-show) captcha prompt instead of proceeding.
-    if not context.user_data.get("verified"):
-        # ensure captcha is initialized
-        if not context.user_data.get("awaiting_captcha"):
-            q_text, _ = start_captcha_for_user(context.user_data)
-        else:
-            q_text = context.user_data.get("captcha_question", "Please answer the verification question.")
+    conv = conversation(context.user_data)
+    if not conv.verified:
+        q_text = conv.pending_captcha()
 
         await q.edit_message_text(
             "🛡️ Verification required\n\n"
@@ -927,7 +2532,7 @@ async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     if action == "menu":
         # back to main menu: clear flow but keep verified flag
-        clear_flow_keep_verified(context.user_data)
+        conv.reset()
         await q.edit_message_text(
             MAIN_MENU_TEXT, parse_mode=ParseMode.MARKDOWN, reply_markup=MAIN_MENU_KB
         )
@@ -987,12 +2592,9 @@ async def type_selected_callback(update: Update, context: ContextTypes.DEFAULT_T
     await q.answer()
 
     # require verification for callbacks
-    if not context.user_data.get("verified"):
-        # ensure captcha is initialized
-        if not context.user_data.get("awaiting_captcha"):
-            q_text, _ = start_captcha_for_user(context.user_data)
-        else:
-            q_text = context.user_data.get("captcha_question", "Please answer the verification question.")
+    conv = conversation(context.user_data)
+    if not conv.verified:
+        q_text = conv.pending_captcha()
         await q.edit_message_text(
             "🛡️ Verification required\n\n"
             "Please solve this simple question before using the bot:\n\n"
@@ -1006,8 +2608,8 @@ async def type_selected_callback(update: Update, context: ContextTypes.DEFAULT_T
     data = q.data  # e.g., "type:iso"
     _, ctype = data.split(":", 1)
     # clear flow keys but keep verification status
-    clear_flow_keep_verified(context.user_data)
-    context.user_data["cert_type"] = ctype
+    conv.reset()
+    conv.cert_type = ctype
 
     # FSSC now shows standard selection keyboard
     if ctype == "fssc":
@@ -1017,6 +2619,17 @@ async def type_selected_callback(update: Update, context: ContextTypes.DEFAULT_T
     kb = make_cb_keyboard_for_type(ctype)
     await q.edit_message_text(f"You selected *{ctype.upper()}*.\n\nPlease select the Certification Body to proceed:", parse_mode=ParseMode.MARKDOWN, reply_markup=kb)
 
+# ---------- certification-body input flow ----------
+async def send_verification(message, cb: str, ident: str, extra: Optional[str] = None) -> None:
+    """Verify and reply with the result (edited if it was stale and changes), source line and closing messages."""
+    res = await verify_certificate(cb, ident, extra)
+    sent = await safe_send_text(message.reply_text, res.render("html") or NOT_FOUND, cb=res.cb, disable_web_page_preview=False)
+    edit_when_refreshed(res, sent, disable_web_page_preview=False)
+    if res.ok:
+        await message.reply_text(f"🔎 *Source:* {res.source}\n🏷️ *Accreditation Body:* {res.ab}", parse_mode=ParseMode.MARKDOWN)
+    await message.reply_text(THANK_YOU_BRIEF)
+    await message.reply_text("—", reply_markup=AGAIN_KB)
+
 # ---------- FSSC callback handlers ----------
 async def fssc_selected_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -1025,11 +2638,9 @@ async def fssc_selected_callback(update: Update, context: ContextTypes.DEFAULT_T
     """
     q = update.callback_query
     await q.answer()
-    if not context.user_data.get("verified"):
-        if not context.user_data.get("awaiting_captcha"):
-            q_text, _ = start_captcha_for_user(context.user_data)
-        else:
-            q_text = context.user_data.get("captcha_question", "Please answer the verification question.")
+    conv = conversation(context.user_data)
+    if not conv.verified:
+        q_text = conv.pending_captcha()
         await q.edit_message_text(
             "🛡️ Verification required\n\n"
             "Please solve this simple question before using the bot:\n\n"
@@ -1041,7 +2652,7 @@ async def fssc_selected_callback(update: Update, context: ContextTypes.DEFAULT_T
         return
 
     _, standard = q.data.split(":", 1)
-    context.user_data["fssc_standard"] = standard
+    conv.fssc_standard = standard
     # show method selection
     await q.edit_message_text(f"You selected *FSSC {standard}*.\n\nChoose verification method:", parse_mode=ParseMode.MARKDOWN, reply_markup=make_fssc_method_kb(standard))
 
@@ -1051,11 +2662,9 @@ async def fssc_method_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     """
     q = update.callback_query
     await q.answer()
-    if not context.user_data.get("verified"):
-        if not context.user_data.get("awaiting_captcha"):
-            q_text, _ = start_captcha_for_user(context.user_data)
-        else:
-            q_text = context.user_data.get("captcha_question", "Please answer the verification question.")
+    conv = conversation(context.user_data)
+    if not conv.verified:
+        q_text = conv.pending_captcha()
         await q.edit_message_text(
             "🛡️ Verification required\n\n"
             "Please solve this simple question before using the bot:\n\n"
@@ -1072,35 +2681,93 @@ async def fssc_method_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         await q.edit_message_text("Invalid selection. Returning to main menu.", reply_markup=MAIN_MENU_KB)
         return
 
-    context.user_data["fssc_standard"] = standard
-    # mark we're in an FSSC flow
-    context.user_data["in_fssc_flow"] = True
+    conv.fssc_standard = standard
 
     if method == "coid":
-        context.user_data["awaiting_coid"] = True
-        await q.edit_message_text(PROMPT_COID, parse_mode=ParseMode.MARKDOWN)
+        await q.edit_message_text(conv.begin_body("fssc"), parse_mode=ParseMode.MARKDOWN)
         return
 
     if method == "company":
         # Ask for company name (we will attempt to resolve COID automatically; if not found we will ask user for COID)
-        context.user_data["awaiting_fssc_company"] = True
+        conv.step = Step.FSSC_COMPANY
         await q.edit_message_text("Please enter the *company name* (exact or partial). I will try to find the COID automatically; if I can't, I'll ask you to provide the COID manually.", parse_mode=ParseMode.MARKDOWN)
         return
 
     await q.edit_message_text("Unknown method selected.", reply_markup=MAIN_MENU_KB)
 
-# certification-body selection handler (unchanged behavior except for SISBEL addition)
+# ---------- FSSC company-name disambiguation ----------
+def make_fssc_pick_kb(candidates: List[Dict[str, Any]], live: bool = False) -> InlineKeyboardMarkup:
+    """Candidate buttons; live=True when they already come from the fssc.com search."""
+    kb = []
+    for c in candidates:
+        label = (c.get("organization") or c["coid"])[:48]
+        if c.get("country"):
+            label += f" ({c['country'][:20]})"
+        kb.append([InlineKeyboardButton(f"🏭 {label}", callback_data=f"fsscpick:{c['coid']}"[:64])])
+    if not live:
+        kb.append([InlineKeyboardButton("🔎 None of these — search FSSC register", callback_data="fsscpick:*live")])
+    kb.append([InlineKeyboardButton("🆔 Enter COID manually", callback_data="fsscpick:*coid")])
+    return InlineKeyboardMarkup(kb)
+
+
+async def fssc_pick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Handler for 'fsscpick:<coid>' (candidate chosen), 'fsscpick:*live' (search fssc.com)
+    and 'fsscpick:*coid' (ask for the COID).
+    """
+    q = update.callback_query
+    await q.answer()
+    conv = conversation(context.user_data)
+    if not conv.verified:
+        await q.edit_message_text("🛡️ Verification required. Please send /start first.")
+        return
+    _, choice = q.data.split(":", 1)
+    company_name = conv.last_company
+
+    if choice == "*coid":
+        await q.edit_message_text(conv.begin_body("fssc"), parse_mode=ParseMode.MARKDOWN)
+        return
+
+    if choice == "*live":
+        if not company_name:
+            await q.edit_message_text("Please start the search again.", reply_markup=MAIN_MENU_KB)
+            return
+        await q.edit_message_text(PROCESSING)
+        candidates = await asyncio.to_thread(search_fssc_candidates_live, company_name)
+        if candidates and not _is_confident(candidates):
+            # not a sure match (even a single one): the user chooses, only that choice is a pick
+            spawn_background(prefetch_fssc_details([c["coid"] for c in candidates[:FSSC_PREFETCH_TOP]]))
+            await q.edit_message_text("Companies found on the FSSC register. Please choose the right one:",
+                                      reply_markup=make_fssc_pick_kb(candidates, live=True))
+            return
+        if candidates:
+            coid = candidates[0]["coid"]
+            fssc_name_index.add(company_name, coid)
+        else:
+            coid = await asyncio.to_thread(find_coid_by_company_name_live, company_name)
+        if not coid:
+            conv.begin_body("fssc")
+            await q.message.reply_text("I couldn't automatically find the COID for that company.\n\nPlease provide the COID ID so I can fetch the certificate.")
+            return
+    else:
+        coid = choice
+        if company_name:
+            # remember the user's spelling so the same query resolves directly next time (for them)
+            record_fssc_pick(conv.fssc_picks, q.from_user.id, company_name, coid)
+        await q.edit_message_text(PROCESSING)
+
+    conv.reset()
+    await send_verification(q.message, "fssc", coid)
+
+# certification-body selection handler: starts collecting the body's inputs (CertBody.inputs)
 async def cb_selected_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
 
     # require verification for callbacks
-    if not context.user_data.get("verified"):
-        # ensure captcha is initialized
-        if not context.user_data.get("awaiting_captcha"):
-            q_text, _ = start_captcha_for_user(context.user_data)
-        else:
-            q_text = context.user_data.get("captcha_question", "Please answer the verification question.")
+    conv = conversation(context.user_data)
+    if not conv.verified:
+        q_text = conv.pending_captcha()
         await q.edit_message_text(
             "🛡️ Verification required\n\n"
             "Please solve this simple question before using the bot:\n\n"
@@ -1113,36 +2780,7 @@ async def cb_selected_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 
     data = q.data  # e.g., "cb:qro_com"
     _, cb = data.split(":", 1)
-    context.user_data["cb"] = cb
-
-    if cb == "fssc":
-        context.user_data["awaiting_coid"] = True
-        await q.edit_message_text(PROMPT_COID, parse_mode=ParseMode.MARKDOWN)
-        return
-
-    if cb == "infinity":
-        context.user_data["awaiting_cert_no"] = True
-        await q.edit_message_text("You selected *Infinity*.\n\n" + PROMPT_CERT_NO, parse_mode=ParseMode.MARKDOWN)
-        return
-
-    if cb == "qsi":
-        context.user_data["awaiting_cert_no"] = True
-        await q.edit_message_text("You selected *QSI*.\n\nPlease provide the certificate ID exactly as it is printed on your certificate.", parse_mode=ParseMode.MARKDOWN)
-        return
-
-    if cb in ("qro_com", "qro_org"):
-        context.user_data["awaiting_cert_no"] = True
-        await q.edit_message_text("You selected *QRO*.\n\n" + PROMPT_CERT_NO, parse_mode=ParseMode.MARKDOWN)
-        return
-
-    if cb == "sisbel":
-        # SISBEL flow: ask for company name first
-        context.user_data["awaiting_sisbel_company"] = True
-        await q.edit_message_text("You selected *SISBEL*.\n\nPlease enter the *company name* to search:", parse_mode=ParseMode.MARKDOWN)
-        return
-
-    context.user_data["awaiting_cert_no"] = True
-    await q.edit_message_text("You selected *Other / Auto-Fallback*.\n\n" + PROMPT_CERT_NO, parse_mode=ParseMode.MARKDOWN)
+    await q.edit_message_text(conv.begin_body(cb), parse_mode=ParseMode.MARKDOWN)
 
 # 'again' handler -> return to main menu or restart flow
 async def cb_again_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1150,12 +2788,9 @@ async def cb_again_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await q.answer()
 
     # require verification for callbacks
-    if not context.user_data.get("verified"):
-        # ensure captcha is initialized
-        if not context.user_data.get("awaiting_captcha"):
-            q_text, _ = start_captcha_for_user(context.user_data)
-        else:
-            q_text = context.user_data.get("captcha_question", "Please answer the verification question.")
+    conv = conversation(context.user_data)
+    if not conv.verified:
+        q_text = conv.pending_captcha()
         await q.edit_message_text(
             "🛡️ Verification required\n\n"
             "Please solve this simple question before using the bot:\n\n"
@@ -1167,300 +2802,654 @@ async def cb_again_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # clear flow but keep verified
-    clear_flow_keep_verified(context.user_data)
+    conv.reset()
     try:
         await q.edit_message_text(MAIN_MENU_TEXT, parse_mode=ParseMode.MARKDOWN, reply_markup=MAIN_MENU_KB)
     except Exception:
         await q.edit_message_text("Welcome — choose an option.", reply_markup=MAIN_MENU_KB)
 
+# ---------- text steps (one per Step; TEXT_STEPS dispatches on Conversation.step) ----------
+async def captcha_step(message, conv: Conversation, text: str) -> None:
+    # accept the first integer-like token (allow + or -)
+    m = re.search(r"[-+]?\d+", text)
+    if m and m.group(0) == conv.captcha_answer:
+        # Verified!
+        conv.reset()
+        conv.verified = True
+        try:
+            await message.reply_text("✅ Correct — verification passed. Welcome!", parse_mode=ParseMode.MARKDOWN)
+            await message.reply_text(MAIN_MENU_TEXT, parse_mode=ParseMode.MARKDOWN, reply_markup=MAIN_MENU_KB)
+        except Exception:
+            await message.reply_text(MAIN_MENU_TEXT, reply_markup=MAIN_MENU_KB)
+        return
+    conv.captcha_attempts -= 1
+    if conv.captcha_attempts <= 0:
+        # exhausted attempts -> back to an unverified, idle conversation
+        conv.reset()
+        await message.reply_text("❌ Verification failed. You have used all attempts. Please send /start to try again.")
+        return
+    if not m:
+        await message.reply_text(f"Please reply with a numeric answer. Attempts left: {conv.captcha_attempts}")
+    else:
+        await message.reply_text(f"Incorrect answer. Attempts left: {conv.captcha_attempts}. Please try again.")
+
+async def fssc_company_step(message, conv: Conversation, text: str) -> None:
+    """Company name -> COID: resolve it, offer candidates, or ask for the COID."""
+    conv.step = Step.IDLE
+    conv.last_company = text
+    await message.reply_text(PROCESSING)
+    coid, candidates = await asyncio.to_thread(resolve_fssc_company, text, dict(conv.fssc_picks))
+    if candidates:
+        # several matches: let the user pick (detail pages of the top ones load meanwhile)
+        spawn_background(prefetch_fssc_details([c["coid"] for c in candidates[:FSSC_PREFETCH_TOP]]))
+        await message.reply_text(
+            "I found these similar companies. Please choose the right one:",
+            reply_markup=make_fssc_pick_kb(candidates, live=candidates[0].get("live", False)),
+        )
+        return
+    if not coid:
+        # couldn't auto-resolve, ask user to provide COID
+        conv.begin_body("fssc")
+        await message.reply_text("I couldn't automatically find the COID for that company.\n\nPlease provide the COID ID so I can fetch the certificate.", parse_mode=ParseMode.MARKDOWN)
+        return
+    conv.reset()
+    await send_verification(message, "fssc", coid)
+
+async def body_input_step(message, conv: Conversation, text: str) -> None:
+    """Store the awaited input of the selected body; verify once all of CertBody.inputs are in."""
+    body = CERT_BODIES.get(conv.cb) or CERT_BODIES["other"]
+    value = INPUT_PARSERS[conv.awaiting](text)
+    if value is None:
+        await message.reply_text(INPUT_INVALID.get(conv.awaiting) or body.prompt(conv.awaiting), parse_mode=ParseMode.MARKDOWN)
+        return
+    conv.inputs[conv.awaiting] = value
+    remaining = [name for name in body.inputs if name not in conv.inputs]
+    if remaining:
+        conv.awaiting = remaining[0]
+        await message.reply_text(body.prompt(conv.awaiting), parse_mode=ParseMode.MARKDOWN)
+        return
+    ident, extra = body.split_inputs(conv.inputs)
+    conv.reset()
+    await message.reply_text(PROCESSING)
+    await send_verification(message, body.key, ident, extra)
+
+TEXT_STEPS = {
+    Step.CAPTCHA: captcha_step,
+    Step.FSSC_COMPANY: fssc_company_step,
+    Step.BODY_INPUT: body_input_step,
+}
+
 # Primary message handler (text input)
 async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = (update.message.text or "").strip()
     if not text:
         await update.message.reply_text("Empty message received. Please send text or use /start to begin.", reply_markup=MAIN_MENU_KB)
         return
-
-    # ----- CAPTCHA handling (highest priority) -----
-    if context.user_data.get("awaiting_captcha"):
-        # Expect numeric answer
-        answer_expected = context.user_data.get("captcha_answer")
-        attempts_left = context.user_data.get("captcha_attempts", 0)
-        # sanitize the user input: extract first integer-like token
-        user_resp = text.strip()
-        # Accept numeric forms (allow + or -)
-        m = re.search(r"[-+]?\d+", user_resp)
-        if not m:
-            # non-numeric reply
-            context.user_data["captcha_attempts"] = attempts_left - 1
-            if context.user_data["captcha_attempts"] <= 0:
-                # exhausted attempts -> fully clear state (including verified)
-                context.user_data.clear()
-                await update.message.reply_text("❌ Verification failed. You have used all attempts. Please send /start to try again.")
-                return
-            await update.message.reply_text(f"Please reply with a numeric answer. Attempts left: {context.user_data['captcha_attempts']}")
-            return
-        user_ans = m.group(0)
-        if user_ans == answer_expected:
-            # Verified!
-            context.user_data["verified"] = True
-            context.user_data.pop("awaiting_captcha", None)
-            context.user_data.pop("captcha_question", None)
-            context.user_data.pop("captcha_answer", None)
-            context.user_data.pop("captcha_attempts", None)
-            # Show main menu now
-            try:
-                await update.message.reply_text("✅ Correct — verification passed. Welcome!", parse_mode=ParseMode.MARKDOWN)
-                await update.message.reply_text(MAIN_MENU_TEXT, parse_mode=ParseMode.MARKDOWN, reply_markup=MAIN_MENU_KB)
-            except Exception:
-                await update.message.reply_text(MAIN_MENU_TEXT, reply_markup=MAIN_MENU_KB)
-            return
-        else:
-            # Wrong answer
-            attempts_left = attempts_left - 1
-            context.user_data["captcha_attempts"] = attempts_left
-            if attempts_left <= 0:
-                context.user_data.clear()
-                await update.message.reply_text("❌ Verification failed. You have used all attempts. Please send /start to try again.")
-                return
-            else:
-                await update.message.reply_text(f"Incorrect answer. Attempts left: {attempts_left}. Please try again.")
-                return
-    # ----- END CAPTCHA handling -----
-
-    # ----- SISBEL flow handling (company -> cert) -----
-    if context.user_data.get("awaiting_sisbel_company"):
-        # save company and ask for certificate number
-        company = text.strip().upper()
-        context.user_data.pop("awaiting_sisbel_company", None)
-        context.user_data["sisbel_company"] = company
-        context.user_data["awaiting_sisbel_cert"] = True
-        await update.message.reply_text("Now enter the *certificate number*:", parse_mode=ParseMode.MARKDOWN)
+    conv = conversation(context.user_data)
+    step = TEXT_STEPS.get(conv.step)
+    if step is None:
+        await update.message.reply_text("Please use the main menu. /start", reply_markup=MAIN_MENU_KB)
+        return
+    await step(update.message, conv, text)
+
+# ---------------- error handler ----------------
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Busy certification bodies get a friendly retry message; everything else is logged."""
+    if isinstance(context.error, UpstreamBusy):
+        message = update.effective_message if isinstance(update, Update) else None
+        if message:
+            await message.reply_text(BUSY_MSG, reply_markup=AGAIN_KB)
         return
+    logger.error("Unhandled error while processing an update", exc_info=context.error)
+
+# ---------------- Bulk verification (CSV upload) ----------------
+BULK_HELP_TEXT = (
+    "📑 *Bulk verification*\n\n"
+    "Upload a `.csv` file with one certificate per row:\n"
+    "`body, certificate number, issue date or COID (optional)`\n\n"
+    "Body is one of: " + ", ".join(QUICK_BODIES).replace("_", "\\_") + ".\n"
+    "QRO rows need an issue date (YYYY-MM-DD or DD/MM/YYYY); FSSC rows may give the COID in either column.\n"
+    f"Up to {BULK_MAX_ROWS} rows per file."
+)
+BULK_RESULT_COLUMNS = ["row", "body", "certificate_no", "issue_date", "result", "source", "accreditation_body", "details"]
 
-    if context.user_data.get("awaiting_sisbel_cert"):
-        company = context.user_data.get("sisbel_company")
-        cert_no = text
-        # clear flow but keep verified
-        clear_flow_keep_verified(context.user_data)
-        await update.message.reply_text(PROCESSING)
+_bulk_host_sems: Dict[str, asyncio.Semaphore] = {}
+# set while a bulk row is verified: fallback-chain members then also take their own _bulk_host_sem
+bulk_row: contextvars.ContextVar[bool] = contextvars.ContextVar("taj_bulk_row", default=False)
 
-        payload = {
-            "firmaaranan": company,
-            "belgenoaranan": cert_no,
-            "captcha": {"sayi1": 0, "sayi2": 0, "operator": "*", "cevap": 0}
-        }
+def _bulk_host_sem(cb: str) -> asyncio.Semaphore:
+    sem = _bulk_host_sems.get(cb)
+    if sem is None:
+        sem = asyncio.Semaphore(CERT_BODIES[cb].bulk_limit)
+        _bulk_host_sems[cb] = sem
+    return sem
 
+def parse_bulk_rows(raw: bytes) -> List[Dict[str, Any]]:
+    """
+    Parse an uploaded CSV into row dicts: {row, body, cb, cert_no, issue_date, error}.
+    Header rows and blank lines are skipped; rows beyond BULK_MAX_ROWS are dropped.
+    """
+    text = raw.decode("utf-8-sig", errors="replace")
+    try:
+        dialect = csv.Sniffer().sniff(text[:2048], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    rows = []
+    for lineno, rec in enumerate(csv.reader(io.StringIO(text), dialect), start=1):
+        cells = [c.strip() for c in rec]
+        if not any(cells):
+            continue
+        if lineno == 1 and cells[0].lower() in ("body", "cb", "certification body"):
+            continue
+        cells += [""] * (3 - len(cells))
+        body, cert_no, extra = cells[0], cells[1], cells[2]
+        item = {"row": lineno, "body": body, "cb": normalize_cb_name(body), "cert_no": cert_no, "issue_date": None, "error": None}
+        cert_body = CERT_BODIES.get(item["cb"])
+        if cert_body and not cert_body.extra:
+            # bodies without a date (FSSC COID, Infinity, QSI) may give the identifier in either column
+            item["cert_no"] = canonical_id(item["cb"], cert_no or extra)
+        elif extra:
+            item["issue_date"] = validate_date_input(extra)
+            if not item["issue_date"]:
+                item["error"] = "Invalid issue date"
+        if not cert_body:
+            item["error"] = "Unknown certification body"
+        elif not cert_body.quick:
+            item["error"] = f"{cert_body.title or cert_body.key} is not supported in bulk mode"
+        elif not item["cert_no"]:
+            item["error"] = "Missing certificate number"
+        elif cert_body.missing_extra(item["issue_date"]) and not item["error"]:
+            item["error"] = f"Issue date required for {cert_body.title or cert_body.key}"
+        rows.append(item)
+        if len(rows) >= BULK_MAX_ROWS:
+            break
+    return rows
+
+async def _bulk_verify_one(item: Dict[str, Any], global_sem: asyncio.Semaphore) -> List[Any]:
+    base = [item["row"], item["body"], item["cert_no"], item["issue_date"] or ""]
+    if item["error"]:
+        return base + ["invalid", "", "", item["error"]]
+    token = bulk_row.set(True)
+    async with global_sem, _bulk_host_sem(item["cb"]):
         try:
-            r = requests.post(SISBEL_API_URL, json=payload, timeout=REQUEST_TIMEOUT)
-            r.raise_for_status()
-            data = r.json()
-
-            if data.get("success") and data.get("data"):
-                cert = data['data']
-                formatted_message = (
-                    f"✅ *Certificate Details:*\n\n"
-                    f"🏢 *Company:* {cert.get('firma')}\n"
-                    f"🏙 *City/Province:* {cert.get('il')}\n"
-                    f"📍 *Address:* {cert.get('adres')}\n"
-                    f"🏳 *Country:* {cert.get('ulke')}\n"
-                    f"🎖 *Standard:* {cert.get('belge')}\n"
-                    f"🔑 *Certificate Number:* {cert.get('sertifikaNo')}\n"
-                    f"📋 *Scope:* {cert.get('kapsam')}\n"
-                    f"📅 *Validity Date:* {cert.get('belgegecerliliktarihi')}\n"
-                    f"✔ *Validity Status:* {cert.get('belgegecerlilikdurumu')}"
-                )
-                await update.message.reply_text(formatted_message, parse_mode=ParseMode.MARKDOWN)
-            else:
-                await update.message.reply_text(NOT_FOUND)
-
+            for attempt in range(BULK_BUSY_RETRIES + 1):
+                res = await verify_certificate(item["cb"], item["cert_no"], item["issue_date"])
+                if res.status != "busy" or attempt == BULK_BUSY_RETRIES:
+                    break
+                await asyncio.sleep(BULK_BUSY_BACKOFF * 2 ** attempt)
         except Exception as e:
-            logger.exception("SISBEL API error: %s", e)
-            await update.message.reply_text(f"❌ Error fetching SISBEL data: {e}")
+            logger.exception("bulk verify error (row %s): %s", item["row"], e)
+            return base + ["error", "", "", str(e)]
+        finally:
+            bulk_row.reset(token)
+    return base + [res.status, res.source, res.ab, res.render("text").replace("\n", " | ")]
 
-        # end SISBEL flow - present main menu options again
-        await update.message.reply_text(THANK_YOU_BRIEF)
-        await update.message.reply_text("—", reply_markup=AGAIN_KB)
+async def run_bulk_verification(rows: List[Dict[str, Any]], progress=None) -> List[List[Any]]:
+    """
+    Verify all rows concurrently (bounded by BULK_CONCURRENCY and the per-body limits).
+    progress(done, total) is awaited after each row; results keep the input order.
+    """
+    global_sem = asyncio.Semaphore(BULK_CONCURRENCY)
+    results: List[Optional[List[Any]]] = [None] * len(rows)
+    done = 0
+
+    async def worker(i: int, item: Dict[str, Any]):
+        nonlocal done
+        results[i] = await _bulk_verify_one(item, global_sem)
+        done += 1
+        if progress:
+            await progress(done, len(rows))
+
+    with background_priority():
+        await asyncio.gather(*(worker(i, it) for i, it in enumerate(rows)))
+    return results
+
+def bulk_results_csv(results: List[List[Any]]) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(BULK_RESULT_COLUMNS)
+    writer.writerows(results)
+    return out.getvalue().encode("utf-8-sig")
+
+async def bulk_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/bulk: explain the CSV format for bulk verification."""
+    if not conversation(context.user_data).verified:
+        await update.message.reply_text("🛡️ Verification required. Please send /start first.")
         return
+    await update.message.reply_text(BULK_HELP_TEXT, parse_mode=ParseMode.MARKDOWN)
 
-    # ----- FSSC flow: company-name -> attempt auto-COID resolution ----- 
-    if context.user_data.get("awaiting_fssc_company"):
-        company_name = text.strip()
-        context.user_data.pop("awaiting_fssc_company", None)
-        context_user = context.user_data
-        context_user["last_searched_company"] = company_name
-        # attempt to resolve COID
-        await update.message.reply_text(PROCESSING)
-        coid = await asyncio.to_thread(find_coid_by_company_name, company_name)
-        if not coid:
-            # couldn't auto-resolve, ask user to provide COID
-            context_user["awaiting_coid"] = True
-            # keep fssc flow marker set
-            context_user["in_fssc_flow"] = True
-            await update.message.reply_text("I couldn't automatically find the COID for that company.\n\nPlease provide the COID ID so I can fetch the certificate.", parse_mode=ParseMode.MARKDOWN)
-            return
-        # got COID -> fetch FSSC details
-        res = await asyncio.to_thread(fetch_fssc_by_coid, coid)
-        # clear flow but keep verified
-        clear_flow_keep_verified(context.user_data)
-        if isinstance(res, dict) and res.get("error"):
-            await update.message.reply_text(f"{ERROR_MSG}\n\n{html.escape(res.get('error'))}")
-            await update.message.reply_text(THANK_YOU_BRIEF)
-            await update.message.reply_text("—", reply_markup=AGAIN_KB)
-            return
-        if res == "not_found":
-            await update.message.reply_text(f"❌ No certificate found for COID: {html.escape(coid)}")
-            await update.message.reply_text(THANK_YOU_BRIEF)
-            await update.message.reply_text("—", reply_markup=AGAIN_KB)
-            return
-        formatted = format_fssc_result(res) or NOT_FOUND
-        await safe_send_text(update.message.reply_text, formatted, disable_web_page_preview=False)
-        cb_name = "FSSC Public Register"
-        ab = "FSSC / Not provided"
-        await update.message.reply_text(f"🔎 *Source:* {cb_name}\n🏷️ *Accreditation Body:* {ab}", parse_mode=ParseMode.MARKDOWN)
-        await update.message.reply_text(THANK_YOU_BRIEF)
-        await update.message.reply_text("—", reply_markup=AGAIN_KB)
+async def bulk_document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle an uploaded .csv: verify every row and reply with a results CSV."""
+    if not conversation(context.user_data).verified:
+        await update.message.reply_text("🛡️ Verification required. Please send /start first.")
+        return
+    try:
+        tg_file = await update.message.document.get_file()
+        raw = bytes(await tg_file.download_as_bytearray())
+    except Exception as e:
+        logger.exception("bulk upload download error: %s", e)
+        await update.message.reply_text(ERROR_MSG)
+        return
+    rows = parse_bulk_rows(raw)
+    if not rows:
+        await update.message.reply_text(BULK_HELP_TEXT, parse_mode=ParseMode.MARKDOWN)
         return
 
-    # ----- FSSC COID flow (used both when user selects Verify by COID or after company name fallback) -----
-    if context.user_data.get("awaiting_coid"):
-        coid_input = text.strip()
-        # If user input contains "COID: ..." remove label
-        coid_input = re.sub(r"(?i)^COID:\s*", "", coid_input).strip()
-        # clear temporary flow while keeping verification
-        # preserve marker whether we were in fssc flow
-        in_fssc_flow = bool(context.user_data.get("in_fssc_flow"))
-        clear_flow_keep_verified(context.user_data)
-        if in_fssc_flow:
-            # set nothing else, we will fetch fssc_by_coid
-            await update.message.reply_text(PROCESSING)
-            res = await asyncio.to_thread(fetch_fssc_by_coid, coid_input)
-            if isinstance(res, dict) and res.get("error"):
-                await update.message.reply_text(f"{ERROR_MSG}\n\n{html.escape(res.get('error'))}")
-                await update.message.reply_text(THANK_YOU_BRIEF)
-                await update.message.reply_text("—", reply_markup=AGAIN_KB)
-                return
-            if res == "not_found":
-                await update.message.reply_text(f"❌ No certificate found for COID: {html.escape(coid_input)}")
-                await update.message.reply_text(THANK_YOU_BRIEF)
-                await update.message.reply_text("—", reply_markup=AGAIN_KB)
-                return
-            formatted = format_fssc_result(res) or NOT_FOUND
-            await safe_send_text(update.message.reply_text, formatted, disable_web_page_preview=False)
-            cb_name = "FSSC Public Register"
-            ab = "FSSC / Not provided"
-            await update.message.reply_text(f"🔎 *Source:* {cb_name}\n🏷️ *Accreditation Body:* {ab}", parse_mode=ParseMode.MARKDOWN)
-            await update.message.reply_text(THANK_YOU_BRIEF)
-            await update.message.reply_text("—", reply_markup=AGAIN_KB)
-            return
-        else:
-            # Not an fssc-specific coid prompt: handle as general COID (original behavior)
-            # clear temporary flow while keeping verification (done already)
-            await update.message.reply_text(PROCESSING)
-            res = await asyncio.to_thread(fetch_fssc_by_coid, coid_input)
-            if isinstance(res, dict) and res.get("error"):
-                await update.message.reply_text(f"{ERROR_MSG}\n\n{html.escape(res.get('error'))}")
-                await update.message.reply_text(THANK_YOU_BRIEF)
-                await update.message.reply_text("—", reply_markup=AGAIN_KB)
-                return
-            if res == "not_found":
-                await update.message.reply_text(f"❌ No certificate found for COID: {html.escape(coid_input)}")
-                await update.message.reply_text(THANK_YOU_BRIEF)
-                await update.message.reply_text("—", reply_markup=AGAIN_KB)
-                return
-            formatted = format_fssc_result(res) or NOT_FOUND
-            await safe_send_text(update.message.reply_text, formatted, disable_web_page_preview=False)
-            cb_name = "FSSC Public Register"
-            ab = "FSSC / Not provided"
-            await update.message.reply_text(f"🔎 *Source:* {cb_name}\n🏷️ *Accreditation Body:* {ab}", parse_mode=ParseMode.MARKDOWN)
-            await update.message.reply_text(THANK_YOU_BRIEF)
-            await update.message.reply_text("—", reply_markup=AGAIN_KB)
-            return
+    status = await update.message.reply_text(f"🔄 Bulk verification: 0/{len(rows)} checked...")
+    last_edit = time.monotonic()
 
-    # awaiting certificate number (other CBs)
-    if context.user_data.get("awaiting_cert_no"):
-        cert_no = text
-        context.user_data["cert_no"] = cert_no
-        context.user_data.pop("awaiting_cert_no", None)
-        cb = context.user_data.get("cb")
-
-        if cb == "infinity":
-            await update.message.reply_text(PROCESSING)
-            res = await asyncio.to_thread(infinity_post_cert, cert_no)
-            if not res:
-                await update.message.reply_text(NOT_FOUND)
-                await update.message.reply_text(THANK_YOU_BRIEF)
-                await update.message.reply_text("—", reply_markup=AGAIN_KB)
-                # clear flow but keep verified
-                clear_flow_keep_verified(context.user_data)
-                return
-            await safe_send_text(update.message.reply_text, format_infty(res) or NOT_FOUND, disable_web_page_preview=False)
-            cb_name = "Infinity Cert International"
-            ab = res.get("dob") or "Not provided"
-            await update.message.reply_text(f"🔎 *Source:* {cb_name}\n🏷️ *Accreditation Body:* {ab}", parse_mode=ParseMode.MARKDOWN)
-            await update.message.reply_text(THANK_YOU_BRIEF)
-            await update.message.reply_text("—", reply_markup=AGAIN_KB)
-            # clear flow but keep verified
-            clear_flow_keep_verified(context.user_data)
+    async def progress(done: int, total: int):
+        nonlocal last_edit
+        now = time.monotonic()
+        if done < total and now - last_edit < BULK_PROGRESS_INTERVAL:
             return
+        last_edit = now
+        try:
+            await status.edit_text(f"🔄 Bulk verification: {done}/{total} checked...")
+        except Exception:
+            pass
 
-        if cb == "qsi":
-            await update.message.reply_text(PROCESSING)
-            parsed = await asyncio.to_thread(fetch_qsi_simple, cert_no)
-            if isinstance(parsed, dict) and parsed.get("error"):
-                await update.message.reply_text(f"{ERROR_MSG}\n\n{parsed.get('error')}")
-                await update.message.reply_text(THANK_YOU_BRIEF)
-                await update.message.reply_text("—", reply_markup=AGAIN_KB)
-                # clear flow but keep verified
-                clear_flow_keep_verified(context.user_data)
-                return
-            if not parsed or not any(parsed.get(k) for k in ("name", "certificate_id", "standard")):
-                await update.message.reply_text(NOT_FOUND)
-                await update.message.reply_text(THANK_YOU_BRIEF)
-                await update.message.reply_text("—", reply_markup=AGAIN_KB)
-                # clear flow but keep verified
-                clear_flow_keep_verified(context.user_data)
-                return
-            await safe_send_text(update.message.reply_text, format_qsi_simple(parsed) or NOT_FOUND, disable_web_page_preview=False)
-            cb_name = "QSI (qsicert.ca)"
-            ab = parsed.get("accreditation") or parsed.get("accreditation_body") or "Not provided"
-            await update.message.reply_text(f"🔎 *Source:* {cb_name}\n🏷️ *Accreditation Body:* {ab}", parse_mode=ParseMode.MARKDOWN)
-            await update.message.reply_text(THANK_YOU_BRIEF)
-            await update.message.reply_text("—", reply_markup=AGAIN_KB)
-            # clear flow but keep verified
-            clear_flow_keep_verified(context.user_data)
-            return
+    t0 = time.monotonic()
+    results = await run_bulk_verification(rows, progress)
+    found = sum(1 for r in results if r[4] == "found")
+    summary = f"✅ Bulk verification finished: {found}/{len(rows)} found in {time.monotonic() - t0:.1f}s."
+    try:
+        await status.edit_text(summary)
+    except Exception:
+        pass
+    await update.message.reply_document(document=bulk_results_csv(results), filename="verification_results.csv", caption=summary)
+    await update.message.reply_text("—", reply_markup=AGAIN_KB)
+
+# ---------------- One-shot /verify ----------------
+VERIFY_USAGE = (
+    "Usage: `/verify <body> <number> [date]`\n\n"
+    "Examples:\n"
+    "`/verify fssc AFG-1-7798-696622`\n"
+    "`/verify infinity 12345`\n"
+    "`/verify qro_com 12345 2025-10-10`\n\n"
+    "Body is one of: " + ", ".join(QUICK_BODIES).replace("_", "\\_") + "."
+)
 
-        # For QRO and Other: ask for issue date typed by user
-        context.user_data["awaiting_issue_date"] = True
-        await update.message.reply_text(PROMPT_ISSUE_DATE_TEXT)
+async def verify_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /verify <body> <number> [date]: verify in a single update, bypassing the
+    type -> body -> number -> date conversation. Uses verify_certificate (same formatters and cache).
+    """
+    if not conversation(context.user_data).verified:
+        await update.message.reply_text("🛡️ Verification required. Please send /start first.")
         return
+    parsed = parse_verify_query(" ".join(context.args or []))
+    if not parsed:
+        await update.message.reply_text(VERIFY_USAGE, parse_mode=ParseMode.MARKDOWN)
+        return
+    cb, cert_no, issue_date = parsed
+    res = await verify_certificate(cb, cert_no, issue_date)
+    sent = await safe_send_text(update.message.reply_text, res.render("html") or NOT_FOUND, cb=res.cb, disable_web_page_preview=False)
+    edit_when_refreshed(res, sent, disable_web_page_preview=False)
+    if res.ok:
+        await update.message.reply_text(
+            f"🔎 *Source:* {res.source}\n🏷️ *Accreditation Body:* {res.ab}",
+            parse_mode=ParseMode.MARKDOWN,
+        )
 
-    # awaiting issue date typed by user
-    if context.user_data.get("awaiting_issue_date"):
-        date_conv = validate_date_input(text)
-        if not date_conv:
-            await update.message.reply_text("Date format not recognized. Please use `YYYY-MM-DD` or `DD/MM/YYYY`. Example: 2025-10-10", parse_mode=ParseMode.MARKDOWN)
-            return
-        cert_no = context.user_data.get("cert_no")
-        cb = context.user_data.get("cb") or "other"
-        # clear flow but keep verified
-        clear_flow_keep_verified(context.user_data)
-        await update.message.reply_text(PROCESSING)
-        msg, ok, meta = await verify_for_cb(cb, cert_no, date_conv)
-        await safe_send_text(update.message.reply_text, msg or NOT_FOUND, disable_web_page_preview=False)
-        cb_name = meta.get("cb", "Unknown")
-        ab = meta.get("ab", "Not provided")
-        await update.message.reply_text(f"🔎 *Source:* {cb_name}\n🏷️ *Accreditation Body:* {ab}", parse_mode=ParseMode.MARKDOWN)
-        await update.message.reply_text(THANK_YOU_BRIEF)
-        await update.message.reply_text("—", reply_markup=AGAIN_KB)
+# ---------------- Inline mode ----------------
+INLINE_HELP = "Type: <body> <number> [date] — e.g. fssc AFG-1-7798-696622 or infinity 12345"
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Inline certificate lookup from any chat. Warm cache entries are answered at once;
+    cold lookups are debounced per user so only the last keystroke hits upstream.
+    """
+    iq = update.inline_query
+    parsed = parse_verify_query(iq.query)
+    if not parsed:
+        help_article = InlineQueryResultArticle(
+            id="help",
+            title="TajCert certificate lookup",
+            description=INLINE_HELP,
+            input_message_content=InputTextMessageContent(INLINE_HELP),
+        )
+        try:
+            await iq.answer([help_article], cache_time=0)
+        except Exception as e:
+            logger.info("inline help answer failed: %s", e)
+        return
+    cb, cert_no, issue_date = parsed
+
+    conv = conversation(context.user_data)
+    conv.inline_seq += 1
+    seq = conv.inline_seq
+    if not is_verification_cached(cb, cert_no, issue_date):
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        if conv.inline_seq != seq:
+            return  # superseded by a newer query from the same user
+
+    try:
+        res = await verify_certificate(cb, cert_no, issue_date)
+    except Exception as e:
+        logger.exception("inline verify error: %s", e)
+        res = VerificationResult(cb, "error", error=str(e))
+    if conv.inline_seq != seq:
         return
 
-    # default fallback
-    await update.message.reply_text("Please use the main menu. /start", reply_markup=MAIN_MENU_KB)
+    plain = res.render("text").splitlines()
+    footer = f"\n\n🔎 <b>Source:</b> {html.escape(res.source)}\n🏷️ <b>Accreditation Body:</b> {html.escape(str(res.ab))}"
+    article = InlineQueryResultArticle(
+        id=hashlib.sha1(f"{cb}:{cert_no}".encode("utf-8")).hexdigest(),
+        title=("✅ " if res.ok else "❌ ") + (plain[0] if plain else cert_no)[:100],
+        description=" · ".join(plain[1:4])[:200] or res.source,
+        input_message_content=InputTextMessageContent(
+            (res.render("html") or NOT_FOUND) + (footer if res.ok else ""),
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True,
+        ),
+    )
+    try:
+        await iq.answer([article], cache_time=INLINE_CACHE_TIME if res.ok else 0)
+    except Exception as e:
+        # query may have expired while the upstream lookup was running
+        logger.info("inline answer failed: %s", e)
+
+# ---------------- Hot-certificate refresh ----------------
+async def refresh_hot_entries(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    JobQueue callback: re-fetch those of the REFRESH_TOP_N most requested keys that have a
+    cached "found" result expiring within REFRESH_AHEAD, at most REFRESH_RATE per second
+    (misses and failed lookups are never cached as results, so they are not re-sent upstream).
+    Access counts are halved every run so popularity follows recent traffic.
+    Expired runtime-cache entries are dropped at the end.
+    """
+    now = time.time()
+    refreshed = 0
+    with background_priority():
+        for (cb, cert_no, issue_date), _hits in _access_counts.most_common(REFRESH_TOP_N):
+            key = _result_cache_key(cb, cert_no, issue_date)
+            cached, expires_at = cache_get(key), cache_expires_at(key)
+            if cached is None or cached.status != "found" or expires_at is None or expires_at - now > REFRESH_AHEAD:
+                continue
+            if refreshed:
+                await asyncio.sleep(1.0 / REFRESH_RATE)
+            try:
+                res = await verify_certificate(cb, cert_no, issue_date, force=True)
+                refreshed += 1
+                logger.debug("refreshed %s:%s -> %s", cb, cert_no, res.status)
+            except Exception as e:
+                logger.exception("refresh of %s:%s failed: %s", cb, cert_no, e)
+
+    for k in list(_access_counts):
+        _access_counts[k] //= 2
+        if not _access_counts[k]:
+            del _access_counts[k]
+    if len(_access_counts) > ACCESS_TRACK_MAX:
+        keep = dict(_access_counts.most_common(ACCESS_TRACK_MAX))
+        _access_counts.clear()
+        _access_counts.update(keep)
+    purged = cache_purge_expired()
+    if refreshed or purged:
+        logger.info("Hot-entry refresh: %d entries re-fetched, %d expired cache entries dropped", refreshed, purged)
+
+# ---------------- event-loop / executor watchdog ----------------
+class LoopWatchdog:
+    """
+    A task on the loop beats every WATCHDOG_INTERVAL and records how late it woke up
+    (taj_loop_lag_seconds) plus the default executor's queue depth and busy threads.
+    A separate thread watches the heartbeat: if the loop has not beaten for WATCHDOG_STALL
+    seconds, whatever is blocking it is logged with the loop thread's current stack.
+    """
+
+    def __init__(self, executor: CountingExecutor):
+        self.executor = executor
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._last_dump = 0.0
+        self._saturated = False
+        self.last_lag = 0.0
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def executor_stats(self) -> Tuple[int, int, int]:
+        """(queued work items, threads started, busy threads), from CountingExecutor's counters."""
+        ex = self.executor
+        return ex.queued, ex.threads, ex.running
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            self.last_lag = max(0.0, loop.time() - t0 - WATCHDOG_INTERVAL)
+            self._beat = time.monotonic()
+            metrics.observe("taj_loop_lag_seconds", self.last_lag)
+            queued, threads, busy = self.executor_stats()
+            metrics.set("taj_executor_queue_depth", queued)
+            metrics.set("taj_executor_threads", threads)
+            metrics.set("taj_executor_busy_threads", busy)
+            for cb, pool in list(_upstream_pools.items()):
+                metrics.set("taj_upstream_queue_depth", pool.queued, cb=cb)
+            if queued and not self._saturated:
+                logger.warning("Executor saturated: %d queued, %d/%d threads busy", queued, busy, EXECUTOR_WORKERS)
+            self._saturated = bool(queued)
+
+    def _watch(self) -> None:
+        stalled = False
+        while not self._stop.wait(WATCHDOG_INTERVAL):
+            blocked = time.monotonic() - self._beat
+            if blocked < WATCHDOG_STALL + WATCHDOG_INTERVAL:
+                stalled = False
+                continue
+            if not stalled:
+                stalled = True
+                metrics.inc("taj_loop_stalls_total")
+            now = time.monotonic()
+            if now - self._last_dump < WATCHDOG_STACK_COOLDOWN:
+                continue
+            self._last_dump = now
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+            logger.warning("Event loop blocked for %.1fs; loop thread stack:\n%s", blocked, stack)
+
+# ---------------- /stats (admins) ----------------
+def format_stats() -> str:
+    """Per-stage latency (bucket-resolution p50/p95) and cache hit rates, as an HTML <pre> table."""
+    def q(h: List[float], p: float) -> str:
+        v = metrics.quantile(h, p)
+        return f"{v * 1000:.0f}" if v != float("inf") else f">{METRICS_BUCKETS[-1] * 1000:.0f}"
+    lines = [f"{'stage':<7}{'cb':<10}{'cache':<6}{'n':>6}{'avg ms':>8}{'p50':>7}{'p95':>7}"]
+    for labels, h in sorted(metrics.histograms("taj_stage_seconds").items(), key=lambda kv: (dict(kv[0])["stage"], dict(kv[0])["cb"])):
+        lb = dict(labels)
+        n = int(sum(h[:-1]))
+        avg = h[-1] / n * 1000 if n else 0.0
+        lines.append(f"{lb['stage']:<7}{lb['cb']:<10}{lb['cache']:<6}{n:>6}{avg:>8.0f}{q(h, 0.5):>7}{q(h, 0.95):>7}")
+    hits: Dict[Tuple[str, str], List[float]] = {}
+    for labels, v in metrics.counters("taj_cache_lookups_total").items():
+        lb = dict(labels)
+        hm = hits.setdefault((lb["layer"], lb["cb"]), [0, 0])
+        hm[0 if lb["result"] == "hit" else 1] += v
+    if hits:
+        lines.append("")
+        lines.append(f"{'cache':<9}{'cb':<10}{'hits':>7}{'misses':>8}{'rate':>7}")
+        for (layer, cb), (h, m) in sorted(hits.items()):
+            lines.append(f"{layer:<9}{cb:<10}{int(h):>7}{int(m):>8}{h / (h + m):>7.0%}")
+    rewrites = metrics.counters("taj_id_rewrites_total")
+    if rewrites:
+        gained = metrics.counters("taj_canonical_hits_total")
+        lines.append("")
+        lines.append(f"{'ids':<9}{'cb':<10}{'rewritten':>10}{'hits gained':>13}")
+        for labels, n in sorted(rewrites.items()):
+            cb = dict(labels)["cb"]
+            n_gained = sum(v for lb, v in gained.items() if dict(lb)["cb"] == cb)
+            lines.append(f"{'':<9}{cb:<10}{int(n):>10}{int(n_gained):>13}")
+    lag = metrics.histograms("taj_loop_lag_seconds").get(())
+    if lag:
+        gauges = {name: metrics.gauges(name).get((), 0) for name in ("taj_executor_queue_depth", "taj_executor_busy_threads", "taj_executor_threads")}
+        stalls = metrics.counters("taj_loop_stalls_total").get((), 0)
+        lines.append("")
+        lines.append(f"loop lag p50 {q(lag, 0.5)} ms, p95 {q(lag, 0.95)} ms; stalls {int(stalls)}")
+        lines.append(f"executor {int(gauges['taj_executor_busy_threads'])}/{EXECUTOR_WORKERS} busy, "
+                     f"{int(gauges['taj_executor_threads'])} started, {int(gauges['taj_executor_queue_depth'])} queued")
+    rejected = {dict(labels)["cb"]: v for labels, v in metrics.counters("taj_upstream_rejected_total").items()}
+    if _upstream_pools or rejected:
+        lines.append("")
+        lines.append(f"{'upstream':<10}{'in use':>8}{'limit':>7}{'busy replies':>14}")
+        for cb in sorted(set(_upstream_pools) | set(rejected)):
+            limit = CERT_BODIES[cb].workers + CERT_BODIES[cb].queue_limit
+            lines.append(f"{cb:<10}{_upstream_inflight[cb]:>8}{limit:>7}{int(rejected.get(cb, 0)):>14}")
+    waits: Dict[str, List[float]] = {}
+    for labels, h in metrics.histograms("taj_ratelimit_wait_seconds").items():
+        host = dict(labels)["host"]
+        waits[host] = [a + b for a, b in zip(waits.get(host, [0.0] * len(h)), h)]
+    if waits:
+        throttled, refused = Counter(), Counter()
+        for labels, v in metrics.counters("taj_ratelimit_throttled_total").items():
+            throttled[dict(labels)["host"]] += v
+        for labels, v in metrics.counters("taj_ratelimit_rejected_total").items():
+            refused[dict(labels)["host"]] += v
+        lines.append("")
+        lines.append(f"{'host':<24}{'wait p95':>9}{'429/503':>9}{'refused':>9}{'paused s':>10}")
+        for host, h in sorted(waits.items()):
+            lines.append(f"{host:<24}{q(h, 0.95):>9}{int(throttled[host]):>9}{int(refused[host]):>9}{upstream_scheduler.paused_for(host):>10.0f}")
+    return "<b>📊 Stats</b>\n<pre>" + html.escape("\n".join(lines)) + "</pre>"
+
+async def stats_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/stats — latency and cache summary (TAJ_ADMIN_IDS only)."""
+    if update.message.from_user.id not in ADMIN_IDS:
+        await update.message.reply_text("⛔ Admin only.")
+        return
+    await update.message.reply_text(format_stats(), parse_mode=ParseMode.HTML)
+
+# ---------------- Local HTTP verification API ----------------
+# Minimal asyncio HTTP/1.1 server running inside the bot's event loop, so it shares
+# verify_certificate, the runtime cache and http_session with the Telegram handlers.
+#   GET /verify?cb=fssc&id=AFG-1-7798-696622[&date=2025-10-10]  -> JSON result
+#   GET /health                                                -> {"status": "ok"}
+#   GET /metrics                                               -> Prometheus text format
+API_MAX_HEADER_BYTES = 16 * 1024
+API_READ_TIMEOUT = 10.0
+
+def _api_response(status: int, payload: Any) -> bytes:
+    """JSON response, or text/plain when payload is a str (metrics)."""
+    reason = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+              500: "Internal Server Error", 503: "Service Unavailable"}.get(status, "OK")
+    if isinstance(payload, str):
+        body, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body, ctype = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    head = (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {ctype}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("ascii") + body
+
+async def api_verify(params: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+    cb = normalize_cb_name(params.get("cb", ""))
+    cert_no = canonical_id(cb, params.get("id") or "") if cb else ""
+    if not cb or not CERT_BODIES[cb].quick or not cert_no:
+        return 400, {"error": f"required query parameters: cb ({'|'.join(QUICK_BODIES)}) and id"}
+    issue_date = None
+    if params.get("date"):
+        issue_date = validate_date_input(params["date"])
+        if not issue_date:
+            return 400, {"error": "date must be YYYY-MM-DD or DD/MM/YYYY"}
+    cached = is_verification_cached(cb, cert_no, issue_date)
+    res = await verify_certificate(cb, cert_no, issue_date)
+    return 503 if res.status == "busy" else 200, {**res.render("json"), "id": cert_no, "cached": cached, "text": res.render("text"), "html": res.render("html")}
+
+async def _api_handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), API_READ_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            return
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            writer.write(_api_response(400, {"error": "bad request line"}))
+            return
+        headers = {}
+        for ln in lines[1:]:
+            if ":" in ln:
+                k, v = ln.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        if API_KEY and headers.get("x-api-key") != API_KEY:
+            writer.write(_api_response(401, {"error": "invalid or missing X-API-Key"}))
+            return
+        if method != "GET":
+            writer.write(_api_response(405, {"error": "only GET is supported"}))
+            return
+        url = urlsplit(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/health":
+            status, payload = 200, {"status": "ok"}
+        elif url.path == "/metrics":
+            status, payload = 200, metrics.render_prometheus()
+        elif url.path == "/verify":
+            try:
+                status, payload = await api_verify(params)
+            except Exception as e:
+                logger.exception("API verify error: %s", e)
+                status, payload = 500, {"error": "internal error"}
+        else:
+            status, payload = 404, {"error": "not found"}
+        writer.write(_api_response(status, payload))
+    finally:
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+async def start_http_api(host: str = API_HOST, port: int = API_PORT) -> asyncio.AbstractServer:
+    server = await asyncio.start_server(_api_handle, host, port, limit=API_MAX_HEADER_BYTES)
+    logger.info("Local verification API listening on http://%s:%s", host, server.sockets[0].getsockname()[1])
+    return server
+
+async def _post_init(app) -> None:
+    executor = CountingExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="taj-io")
+    asyncio.get_running_loop().set_default_executor(executor)
+    watchdog = LoopWatchdog(executor)
+    watchdog.start()
+    app.bot_data["watchdog"] = watchdog
+    if parse_pool():
+        await asyncio.to_thread(run_parser, int, "0")   # start a parser process before the first lookup
+    await asyncio.to_thread(fssc_mirror.load)
+    if API_PORT:
+        app.bot_data["http_api"] = await start_http_api()
+
+async def _post_shutdown(app) -> None:
+    watchdog = app.bot_data.pop("watchdog", None)
+    if watchdog:
+        await watchdog.stop()
+    server = app.bot_data.pop("http_api", None)
+    if server:
+        server.close()
+        await server.wait_closed()
+    await asyncio.to_thread(fssc_mirror.save)
+    await asyncio.to_thread(shutdown_parse_pool)
 
 # ---------------- Main ----------------
-def main() -> None:
-    app = ApplicationBuilder().token(TOKEN).build()
+def build_application(builder: Optional[ApplicationBuilder] = None) -> Application:
+    """Application with all handlers and jobs registered (builder: e.g. loadtest.py's fake Bot API)."""
+    builder = builder or ApplicationBuilder().token(TOKEN)
+    app = builder.post_init(_post_init).post_shutdown(_post_shutdown).build()
 
     # Main menu handlers
     app.add_handler(CommandHandler("start", start_handler))
@@ -1472,9 +3461,31 @@ def main() -> None:
     # FSSC handlers
     app.add_handler(CallbackQueryHandler(fssc_selected_callback, pattern=r"^fssc:"))
     app.add_handler(CallbackQueryHandler(fssc_method_callback, pattern=r"^fssc_method:"))
+    app.add_handler(CallbackQueryHandler(fssc_pick_callback, pattern=r"^fsscpick:"))
+    # One-shot verification
+    app.add_handler(CommandHandler("verify", verify_command_handler))
+    # Admin: latency / cache stats
+    app.add_handler(CommandHandler("stats", stats_command_handler))
+    # Bulk verification (CSV upload)
+    app.add_handler(CommandHandler("bulk", bulk_command_handler))
+    # block=False: a long upload must not hold up other users' updates
+    app.add_handler(MessageHandler(filters.Document.FileExtension("csv"), bulk_document_handler, block=False))
+    # Inline mode (block=False so the debounce sleep does not stall other updates)
+    app.add_handler(InlineQueryHandler(inline_query_handler, block=False))
+    # Background jobs: hot-certificate refresh, FSSC mirror crawl/save (need python-telegram-bot[job-queue])
+    if app.job_queue:
+        app.job_queue.run_repeating(refresh_hot_entries, interval=REFRESH_INTERVAL, first=REFRESH_INTERVAL)
+        app.job_queue.run_repeating(save_fssc_mirror, interval=FSSC_MIRROR_SAVE_INTERVAL, first=FSSC_MIRROR_SAVE_INTERVAL)
+        app.job_queue.run_repeating(crawl_fssc_register, interval=FSSC_CRAWL_INTERVAL, first=60)
+    else:
+        logger.warning("JobQueue not available; hot-certificate refresh and FSSC crawl disabled")
     # Text handler
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_message_handler))
+    app.add_error_handler(error_handler)
+    return app
 
+def main() -> None:
+    app = build_application()
     logger.info("TajCert Bot (main menu + SISBEL + FSSC fixes) starting...")
     app.run_polling()
 
@@ -13,20 +13,29 @@ TAJ Training Bot — updated:
 """
 
 import os
+import sys
+import csv
 import json
+import time
+import asyncio
+import argparse
 import random
 import uuid
 import logging
 import html
 import re
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Iterator, Tuple, IO
 
 from fpdf import FPDF
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update, Message, CallbackQuery
 from telegram.constants import ParseMode
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, CallbackQueryHandler,
+    Application, ApplicationBuilder, CommandHandler, CallbackQueryHandler,
     MessageHandler, ContextTypes, filters
 )
 
@@ -40,6 +49,11 @@ DB_FILE = "taj_bot_final_db.json"
 CERTS_DIR = "taj_certs_final"
 PASS_TOTAL = 50            # required sum (pre + post) to issue certificate
 PRE_PASS = 25              # pre-test pass threshold (for a "pre-pass" feedback)
+# Telegram user ids allowed to run admin commands (/issue_batch ...), comma-separated
+ADMIN_IDS = {int(x) for x in os.environ.get("TAJ_ADMIN_IDS", "").split(",") if x.strip().isdigit()}
+BATCH_WORKERS = os.cpu_count() or 1
+EXPORT_CHUNK_BYTES = 64 * 1024   # DB read size for streaming exports
+EXPORT_CHUNK_ROWS = 500          # CSV rows written per batch
 
 VALID_SERIALS = {
     "ISO 9001": ["9001"],
@@ -62,8 +76,11 @@ def load_db() -> Dict[str, Any]:
         return json.load(f)
 
 
+_db_lock = threading.RLock()   # DB writes from batch issuance threads vs. handlers
+
+
 def save_db(db: Dict[str, Any]) -> None:
-    with open(DB_FILE, "w", encoding="utf-8") as f:
+    with _db_lock, open(DB_FILE, "w", encoding="utf-8") as f:
         json.dump(db, f, ensure_ascii=False, indent=4)
 
 
@@ -984,6 +1001,58 @@ async def cb_edit_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await safe_send_text(context.bot.send_message, prompt, chat_id=query.from_user.id)
 
 
+# ---------------- CERTIFICATE PDF ----------------
+def render_certificate_pdf(uid: str, user: Dict[str, Any]) -> str:
+    """
+    Render the training certificate PDF for a user record that already has
+    a "certificate" entry. Returns the written file path.
+    Module-level (no bot/context access) so it can run in worker processes.
+    """
+    cert = user.get("certificate") or {}
+    cert_no = cert.get("number", "")
+    pre = user.get("pre_test", 0) or 0
+    post = user.get("post_test", 0) or 0
+    total = pre + post
+
+    # Build ASCII-safe (latin-1 fallback) PDF certificate
+    info = user.get("info", {})
+    name_safe = safe_text(info.get("first_name", "")) + " " + safe_text(info.get("last_name", ""))
+    company_safe = safe_text(info.get("company", ""))
+    training_safe = safe_text(cert.get("training") or user.get("training", ""))
+    cert_no_safe = safe_text(cert_no)
+    issued_safe = safe_text(cert.get("issued_at", ""))
+    pre_safe = safe_text(str(pre))
+    post_safe = safe_text(str(post))
+    total_safe = safe_text(str(total))
+
+    pdf_path = os.path.join(CERTS_DIR, f"cert_{uid}_{cert_no}.pdf")
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=16)
+    pdf.cell(0, 10, "TAJ Research & Audit Services Company", ln=True, align="C")
+    pdf.ln(6)
+    pdf.set_font("Arial", size=14)
+    pdf.cell(0, 10, "Certificate of Training", ln=True, align="C")
+    pdf.ln(10)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 8, (
+        f"Name: {name_safe}\n"
+        f"Company: {company_safe}\n"
+        f"Training: {training_safe}\n"
+        f"Certificate Number: {cert_no_safe}\n"
+        f"Issued at: {issued_safe}\n\n"
+        f"Pre-test: {pre_safe}/50\nPost-test: {post_safe}/50\nTotal: {total_safe}/100"
+    ))
+    pdf.output(pdf_path)
+    return pdf_path
+
+
+def _render_certificate_job(job):
+    # ProcessPoolExecutor.map helper: job is (uid, user)
+    uid, user = job
+    return uid, render_certificate_pdf(uid, user)
+
+
 # ---------------- QUIZ HELPERS (unchanged) ----------------
 def prepare_quiz(training: str, lang: str):
     bank = QUESTION_BANK.get(training, {}).get(lang, [])
@@ -1162,36 +1231,7 @@ async def finish_quiz_and_store(chat_id: int, context: ContextTypes.DEFAULT_TYPE
             db["users"][uid] = user
             save_db(db)
 
-            # Build ASCII-safe (latin-1 fallback) PDF certificate
-            info = user.get("info", {})
-            name_safe = safe_text(info.get("first_name", "")) + " " + safe_text(info.get("last_name", ""))
-            company_safe = safe_text(info.get("company", ""))
-            training_safe = safe_text(user.get("training", ""))
-            cert_no_safe = safe_text(cert_no)
-            issued_safe = safe_text(issued)
-            pre_safe = safe_text(str(pre))
-            post_safe = safe_text(str(post))
-            total_safe = safe_text(str(total))
-
-            pdf_path = os.path.join(CERTS_DIR, f"cert_{uid}_{cert_no}.pdf")
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=16)
-            pdf.cell(0, 10, "TAJ Research & Audit Services Company", ln=True, align="C")
-            pdf.ln(6)
-            pdf.set_font("Arial", size=14)
-            pdf.cell(0, 10, "Certificate of Training", ln=True, align="C")
-            pdf.ln(10)
-            pdf.set_font("Arial", size=12)
-            pdf.multi_cell(0, 8, (
-                f"Name: {name_safe}\n"
-                f"Company: {company_safe}\n"
-                f"Training: {training_safe}\n"
-                f"Certificate Number: {cert_no_safe}\n"
-                f"Issued at: {issued_safe}\n\n"
-                f"Pre-test: {pre_safe}/50\nPost-test: {post_safe}/50\nTotal: {total_safe}/100"
-            ))
-            pdf.output(pdf_path)
+            pdf_path = render_certificate_pdf(uid, user)
 
             # send pdf
             try:
@@ -1250,9 +1290,301 @@ async def cmd_myinfo(update: Update, context: ContextTypes.DEFAULT_TYPE):
                          )
 
 
+# ---------------- BATCH ISSUANCE ----------------
+def find_training(name: str) -> Optional[str]:
+    """Resolve a training by exact/case-insensitive name or by its index in TRAININGS."""
+    name = (name or "").strip()
+    if name.isdigit() and int(name) < len(TRAININGS):
+        return TRAININGS[int(name)]
+    for t in TRAININGS:
+        if t.lower() == name.lower():
+            return t
+    return None
+
+
+def render_certificates_for_training(training: str, workers: Optional[int] = None,
+                                     rerender: bool = False) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Render certificates for every user of a training whose pre + post total passes PASS_TOTAL.
+    - Users that already hold a certificate are skipped (or re-rendered with rerender=True,
+      keeping their number).
+    - PDFs are rendered in parallel across processes. The DB is not written: returns
+      (uid -> new certificate, for store_batch_certificates; stats dict with
+      eligible / rendered / failed / seconds / per_sec).
+    """
+    t0 = time.perf_counter()
+    db = load_db()
+    issued = datetime.utcnow().strftime("%Y-%m-%d")
+    jobs = []
+    new_certs: Dict[str, Dict[str, Any]] = {}
+    for uid, user in db["users"].items():
+        if user.get("training") != training or user.get("post_test") is None:
+            continue
+        total = (user.get("pre_test", 0) or 0) + (user.get("post_test", 0) or 0)
+        if total <= PASS_TOTAL:
+            continue
+        if user.get("certificate"):
+            if not rerender:
+                continue
+        else:
+            cert_no = str(uuid.uuid4())[:8].upper()
+            user["certificate"] = new_certs[uid] = {"number": cert_no, "training": training, "issued_at": issued}
+        jobs.append((uid, user))
+
+    rendered: List[str] = []
+    failed: List[str] = []
+    if jobs:
+        # spawn: the bot calls this from a worker thread, and forking a threaded process can inherit held locks
+        with ProcessPoolExecutor(max_workers=workers or BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_render_certificate_job, job): job[0] for job in jobs}
+            for fut in as_completed(futures):
+                uid = futures[fut]
+                try:
+                    fut.result()
+                    rendered.append(uid)
+                except Exception as e:
+                    logger.exception("Batch certificate render failed for %s: %s", uid, e)
+                    failed.append(uid)
+                    new_certs.pop(uid, None)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "training": training,
+        "eligible": len(jobs),
+        "rendered": len(rendered),
+        "failed": len(failed),
+        "seconds": round(elapsed, 2),
+        "per_sec": round(len(rendered) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    logger.info("Batch issuance: %s", stats)
+    return new_certs, stats
+
+
+def store_batch_certificates(certs: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Merge batch-issued certificates into the DB as it is now: it is re-read just before the
+    write, so registrations, scores and certificates saved while the batch rendered are kept.
+    Only the certificate field of users that still have none is set. Returns the number stored.
+    """
+    stored = 0
+    with _db_lock:
+        db = load_db()
+        for uid, cert in certs.items():
+            user = db["users"].get(uid)
+            if user is None or user.get("certificate"):
+                logger.warning("Batch certificate %s for %s not stored: user removed or already certified", cert["number"], uid)
+                continue
+            user["certificate"] = cert
+            stored += 1
+        if stored:
+            save_db(db)
+    return stored
+
+
+def issue_certificates_for_training(training: str, workers: Optional[int] = None, rerender: bool = False) -> Dict[str, Any]:
+    """Render and store a training's certificates (offline CLI); returns the stats dict."""
+    certs, stats = render_certificates_for_training(training, workers=workers, rerender=rerender)
+    store_batch_certificates(certs)
+    return stats
+
+
+async def cmd_issue_batch(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/issue_batch <training name or index> — admin only."""
+    if update.message.from_user.id not in ADMIN_IDS:
+        await safe_send_text(update.message.reply_text, "⛔ Admin only.")
+        return
+    training = find_training(" ".join(context.args or []))
+    if not training:
+        await safe_send_text(update.message.reply_text, "Usage: /issue_batch <training>\nTrainings: " + ", ".join(TRAININGS))
+        return
+    await safe_send_text(update.message.reply_text, f"⏳ Issuing certificates for {training}...")
+    certs, stats = await asyncio.to_thread(render_certificates_for_training, training)
+    # merged on the event loop, where handlers run their load_db() ... save_db() without awaiting
+    # in between, so none of them is holding an older copy of the DB at this point
+    store_batch_certificates(certs)
+    await safe_send_text(update.message.reply_text,
+                         f"✅ {training}: {stats['rendered']}/{stats['eligible']} certificates issued "
+                         f"({stats['failed']} failed) in {stats['seconds']}s — {stats['per_sec']} certs/s")
+
+
+# ---------------- EXPORT ----------------
+EXPORT_COLUMNS = [
+    "user_id", "first_name", "last_name", "job_title", "company", "date", "training",
+    "pre_test", "post_test", "total", "serial_used", "certificate_number", "certificate_issued_at",
+]
+
+
+def iter_db_users(path: str = DB_FILE, chunk_size: int = EXPORT_CHUNK_BYTES) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream (uid, user) pairs out of the DB file without loading the whole users dict.
+    The file is read in chunks and each user object is decoded on its own, so memory
+    stays at roughly one chunk plus one user record.
+    """
+    decoder = json.JSONDecoder()
+    ws = " \t\n\r"
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in ws:
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return
+
+        def expect(ch: str):
+            nonlocal pos
+            skip_ws()
+            if pos >= len(buf) or buf[pos] != ch:
+                raise ValueError(f"DB stream: expected {ch!r} at offset {pos}")
+            pos += 1
+
+        def peek() -> str:
+            skip_ws()
+            return buf[pos] if pos < len(buf) else ""
+
+        def value():
+            nonlocal pos
+            skip_ws()
+            while True:
+                try:
+                    val, end = decoder.raw_decode(buf, pos)
+                    # a scalar ending exactly at the buffer edge may continue in the next chunk
+                    if end < len(buf) or eof or not fill():
+                        pos = end
+                        return val
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+
+        expect("{")
+        while peek() not in ("}", ""):
+            key = value()
+            expect(":")
+            if key != "users":
+                value()
+            else:
+                expect("{")
+                while peek() not in ("}", ""):
+                    uid = value()
+                    expect(":")
+                    yield uid, value()
+                    if peek() == ",":
+                        pos += 1
+                expect("}")
+            if peek() == ",":
+                pos += 1
+
+
+def iter_export_rows(training: Optional[str] = None, date_from: Optional[str] = None,
+                     date_to: Optional[str] = None, path: str = DB_FILE) -> Iterator[List[Any]]:
+    """
+    Yield CSV rows (EXPORT_COLUMNS order) for users matching the filters.
+    Dates are YYYY-MM-DD and compared against the registration "date" field (inclusive).
+    """
+    for uid, user in iter_db_users(path):
+        if training and user.get("training") != training:
+            continue
+        info = user.get("info") or {}
+        date = info.get("date") or ""
+        if date_from and date < date_from:
+            continue
+        if date_to and date > date_to:
+            continue
+        pre = user.get("pre_test")
+        post = user.get("post_test")
+        total = (pre or 0) + (post or 0) if pre is not None or post is not None else None
+        cert = user.get("certificate") or {}
+        yield [
+            uid, info.get("first_name", ""), info.get("last_name", ""), info.get("job_title", ""),
+            info.get("company", ""), date, user.get("training") or "",
+            "" if pre is None else pre, "" if post is None else post, "" if total is None else total,
+            user.get("serial_used") or "", cert.get("number", ""), cert.get("issued_at", ""),
+        ]
+
+
+def write_users_csv(out: IO[str], training: Optional[str] = None, date_from: Optional[str] = None,
+                    date_to: Optional[str] = None, path: str = DB_FILE) -> int:
+    """Write the filtered export to a text stream in EXPORT_CHUNK_ROWS batches. Returns row count."""
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    chunk: List[List[Any]] = []
+    for row in iter_export_rows(training, date_from, date_to, path):
+        chunk.append(row)
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            writer.writerows(chunk)
+            count += len(chunk)
+            chunk = []
+    writer.writerows(chunk)
+    return count + len(chunk)
+
+
+def parse_export_args(args: List[str]) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
+    """
+    Parse /export arguments: up to two YYYY-MM-DD dates (from, to) and an optional training name.
+    Returns (training, date_from, date_to, ok).
+    """
+    dates = [a for a in args if re.match(r"^\d{4}-\d{2}-\d{2}$", a)]
+    rest = " ".join(a for a in args if a not in dates).strip()
+    if len(dates) > 2:
+        return None, None, None, False
+    training = None
+    if rest:
+        training = find_training(rest)
+        if not training:
+            return None, None, None, False
+    return training, (dates[0] if dates else None), (dates[1] if len(dates) > 1 else None), True
+
+
+async def cmd_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/export [training] [from YYYY-MM-DD] [to YYYY-MM-DD] — admin only, replies with a CSV document."""
+    if update.message.from_user.id not in ADMIN_IDS:
+        await safe_send_text(update.message.reply_text, "⛔ Admin only.")
+        return
+    training, date_from, date_to, ok = parse_export_args(context.args or [])
+    if not ok:
+        await safe_send_text(update.message.reply_text,
+                             "Usage: /export [training] [from YYYY-MM-DD] [to YYYY-MM-DD]\nTrainings: " + ", ".join(TRAININGS))
+        return
+
+    # utf-8-sig so Excel picks up the encoding of non-latin names
+    tmp = tempfile.NamedTemporaryFile("w", suffix=".csv", prefix="taj_export_", encoding="utf-8-sig", newline="", delete=False)
+    try:
+        with tmp:
+            count = await asyncio.to_thread(write_users_csv, tmp, training, date_from, date_to)
+        filename = "taj_export" + (f"_{training.replace(' ', '_')}" if training else "") + ".csv"
+        with open(tmp.name, "rb") as fh:
+            await update.message.reply_document(document=fh, filename=filename, caption=f"{count} rows")
+    except Exception as e:
+        logger.exception("Export failed: %s", e)
+        await safe_send_text(update.message.reply_text, "⚠️ Export failed.")
+    finally:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+
+
 # ---------------- MAIN ----------------
-def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+def build_application(builder: Optional[ApplicationBuilder] = None) -> Application:
+    """Application with all handlers registered (builder: e.g. loadtest.py's fake Bot API)."""
+    app = (builder or ApplicationBuilder().token(TOKEN)).build()
 
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CallbackQueryHandler(cb_lang, pattern=r"^lang_"))
@@ -1267,10 +1599,54 @@ def main():
     # messages handler
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler_all))
     app.add_handler(CommandHandler("myinfo", cmd_myinfo))
+    app.add_handler(CommandHandler("issue_batch", cmd_issue_batch))
+    app.add_handler(CommandHandler("export", cmd_export))
+    return app
+
 
+def main():
+    app = build_application()
     logger.info("TAJ Training Bot running...")
     app.run_polling()
 
 
+def cli(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="TAJ Training Bot admin tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_issue = sub.add_parser("issue-batch", help="issue certificates for all passing users of a training")
+    p_issue.add_argument("training", help="training name (e.g. \"FSSC 22000\") or index")
+    p_issue.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    p_issue.add_argument("--rerender", action="store_true", help="also re-render already issued certificates")
+    p_export = sub.add_parser("export", help="stream users/results as CSV")
+    p_export.add_argument("--training", default=None, help="filter by training name or index")
+    p_export.add_argument("--from", dest="date_from", default=None, help="registration date from (YYYY-MM-DD)")
+    p_export.add_argument("--to", dest="date_to", default=None, help="registration date to (YYYY-MM-DD)")
+    p_export.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.command == "issue-batch":
+        training = find_training(args.training)
+        if not training:
+            parser.error(f"unknown training {args.training!r}; choose from: {', '.join(TRAININGS)}")
+        stats = issue_certificates_for_training(training, workers=args.workers, rerender=args.rerender)
+        print(json.dumps(stats, ensure_ascii=False))
+
+    elif args.command == "export":
+        training = None
+        if args.training:
+            training = find_training(args.training)
+            if not training:
+                parser.error(f"unknown training {args.training!r}; choose from: {', '.join(TRAININGS)}")
+        if args.output == "-":
+            write_users_csv(sys.stdout, training, args.date_from, args.date_to)
+        else:
+            with open(args.output, "w", encoding="utf-8-sig", newline="") as out:
+                count = write_users_csv(out, training, args.date_from, args.date_to)
+            print(f"{count} rows written to {args.output}", file=sys.stderr)
+
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
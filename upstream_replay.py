@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+upstream_replay.py
+
+Record/replay transport for the taj.py scrapers (FSSC, Infinity, QSI, QRO, SISBEL), so the
+verification paths can be exercised and benchmarked without the live sites.
+
+- record: run verifications against the live sites and store every upstream response in a
+  fixture directory (one JSON file per request).
+- serve:  local stand-in server answering from the fixtures, with injected latency and errors.
+- bench:  start the stand-in server, route taj.py through it and measure end-to-end
+  verification latency and throughput per certification body, with no network.
+- parse-bench: run the taj.py HTML parsers over the recorded pages with 0 (inline), 1, 2, ...
+  parser processes and report pages/s, to size TAJ_PARSE_WORKERS.
+
+Cases file (CSV, one verification per line: a CERT_BODIES key or alias, then the values in the
+body's CertBody.inputs order; "#" starts a comment):
+    fssc,AFG-1-7798-696622
+    qro_com,QRO-12345,2024-05-01
+    sisbel,ACME GIDA,TR-123
+
+Examples:
+    python upstream_replay.py record cases.csv
+    python upstream_replay.py bench cases.csv --latency 0.3 --jitter 0.2 --error-rate 0.02 -n 200 -c 16
+    python upstream_replay.py parse-bench -n 2000 --workers 0,1,2,4,8
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+import taj
+
+logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+logger = logging.getLogger("upstream_replay")
+
+# ---------------- CONFIG ----------------
+FIXTURES_DIR = os.getenv("TAJ_FIXTURES_DIR", "upstream_fixtures")
+STANDIN_HOST = "127.0.0.1"
+UPSTREAM_URL_HEADER = "X-Upstream-Url"
+INJECTED_RETRY_AFTER = "1"          # Retry-After of injected 429 / 503 answers (taj.py pauses the host this long)
+# hop-by-hop / encoding headers that no longer apply to the stored (decoded) body
+SKIP_RESPONSE_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection", "keep-alive"}
+
+# ---------------- fixture store ----------------
+def _body_bytes(body: Any) -> bytes:
+    if body is None:
+        return b""
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+class FixtureStore:
+    """
+    Recorded upstream responses on disk. Lookups match method + URL + request body first,
+    then fall back to the last response recorded for method + URL.
+    """
+
+    def __init__(self, root: str = FIXTURES_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        self._loose: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def request_key(method: str, url: str, body: Any = None) -> str:
+        return hashlib.sha1(f"{method.upper()} {url}\n".encode("utf-8") + _body_bytes(body)).hexdigest()
+
+    def _index(self, fx: Dict[str, Any]) -> None:
+        self._exact[fx["key"]] = fx
+        self._loose[f"{fx['method']} {fx['url']}"] = fx
+
+    def load(self) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        with self._lock:
+            for name in sorted(os.listdir(self.root)):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                        self._index(json.load(f))
+                except (OSError, ValueError, KeyError):
+                    logger.exception("Skipping unreadable fixture %s", name)
+            return len(self._exact)
+
+    def put(self, method: str, url: str, body: Any, status: int, headers: Dict[str, str], content: bytes) -> str:
+        key = self.request_key(method, url, body)
+        fx = {
+            "key": key,
+            "method": method.upper(),
+            "url": url,
+            "request_body": _body_bytes(body).decode("utf-8", "replace"),
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in SKIP_RESPONSE_HEADERS},
+            "body": content.decode("latin-1"),  # lossless for any byte sequence
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        host = (urlsplit(url).hostname or "unknown").replace(".", "_")
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{host}-{key[:16]}.json")
+        with self._lock:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(fx, f, ensure_ascii=False, indent=1)
+            self._index(fx)
+        return key
+
+    def lookup(self, method: str, url: str, body: Any = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._exact.get(self.request_key(method, url, body)) or self._loose.get(f"{method.upper()} {url}")
+
+# ---------------- transports ----------------
+class RecordingAdapter(HTTPAdapter):
+    """Forwards to the live site and stores every response in the fixture store."""
+
+    def __init__(self, store: FixtureStore, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        resp = super().send(request, **kwargs)
+        try:
+            self.store.put(request.method, request.url, request.body, resp.status_code, dict(resp.headers), resp.content)
+        except Exception:
+            logger.exception("Recording %s %s failed", request.method, request.url)
+        return resp
+
+class StandInAdapter(HTTPAdapter):
+    """Sends every request to the stand-in server, carrying the original URL in a header."""
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip("/")
+
+    def send(self, request, **kwargs):
+        original = request.url
+        request = request.copy()
+        parts = urlsplit(original)
+        request.url = f"{self.base_url}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else "")
+        request.headers[UPSTREAM_URL_HEADER] = original
+        resp = super().send(request, **kwargs)
+        resp.url = original
+        return resp
+
+def install_recorder(store: FixtureStore) -> None:
+    taj.mount_http_adapter(RecordingAdapter(store, pool_connections=taj.HTTP_POOL_SIZE, pool_maxsize=taj.HTTP_POOL_SIZE))
+
+def install_standin(base_url: str, rate_limits: bool = False) -> None:
+    """
+    Send taj.py's upstream traffic to the stand-in server. The production per-host rate limits
+    (taj.upstream_scheduler) are lifted so a run measures the bot rather than the throttling,
+    unless rate_limits=True.
+    """
+    if not rate_limits:
+        taj.upstream_scheduler.limits = {}
+    taj.mount_http_adapter(StandInAdapter(base_url, pool_connections=taj.HTTP_POOL_SIZE, pool_maxsize=taj.HTTP_POOL_SIZE))
+
+# ---------------- stand-in server ----------------
+class StandInServer(ThreadingHTTPServer):
+    """
+    Serves recorded fixtures. Every request waits latency + uniform(0, jitter) seconds;
+    a fraction error_rate is answered with error_status instead (429 / 503 with a short
+    Retry-After, INJECTED_RETRY_AFTER). Unknown requests get 404.
+    """
+    daemon_threads = True
+
+    def __init__(self, store: FixtureStore, port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: Optional[int] = None):
+        super().__init__((STANDIN_HOST, port), _StandInHandler)
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.stats = {"served": 0, "not_modified": 0, "injected_errors": 0, "misses": 0}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{STANDIN_HOST}:{self.server_address[1]}"
+
+    def start(self) -> threading.Thread:
+        t = threading.Thread(target=self.serve_forever, name="standin-server", daemon=True)
+        t.start()
+        return t
+
+    def handle_error(self, request, client_address):
+        # taj.py drops the connection once it has read the section it parses (streamed fetch)
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # keep benchmark output clean
+        pass
+
+    def _reply(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _serve(self) -> None:
+        srv: StandInServer = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        url = self.headers.get(UPSTREAM_URL_HEADER) or self.path
+        with srv.stats_lock:
+            delay = srv.latency + (srv.rng.uniform(0, srv.jitter) if srv.jitter else 0.0)
+            fail = srv.error_rate and srv.rng.random() < srv.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with srv.stats_lock:
+                srv.stats["injected_errors"] += 1
+            headers = {"Content-Type": "text/plain"}
+            if srv.error_status in (429, 503):
+                headers["Retry-After"] = INJECTED_RETRY_AFTER
+            self._reply(srv.error_status, headers, b"injected error")
+            return
+        fx = srv.store.lookup(self.command, url, body)
+        if fx is None:
+            with srv.stats_lock:
+                srv.stats["misses"] += 1
+            logger.warning("No fixture for %s %s", self.command, url)
+            self._reply(404, {"Content-Type": "text/plain"}, b"no fixture")
+            return
+        etag = next((v for k, v in fx["headers"].items() if k.lower() == "etag"), None)
+        if etag and self.headers.get("If-None-Match") == etag:
+            with srv.stats_lock:
+                srv.stats["not_modified"] += 1
+            self._reply(304, {"ETag": etag}, b"")
+            return
+        with srv.stats_lock:
+            srv.stats["served"] += 1
+        self._reply(fx["status"], fx["headers"], fx["body"].encode("latin-1"))
+
+    do_GET = do_POST = do_HEAD = _serve
+
+# ---------------- cases & benchmark ----------------
+def load_cases(path: str) -> List[Tuple[str, ...]]:
+    cases = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            row = [c.strip() for c in row]
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            cb = taj.normalize_cb_name(row[0]) or row[0].lower()
+            body = taj.CERT_BODIES.get(cb)
+            if body is None:
+                raise ValueError(f"unknown certification body {row[0]!r} (one of {', '.join(taj.CERT_BODIES)}): {row}")
+            if body.extra_required and len(row) < 1 + len(body.inputs):
+                raise ValueError(f"{cb} case needs {' and '.join(body.inputs)}: {row}")
+            if len(row) < 2:
+                raise ValueError(f"case needs at least body and certificate number: {row}")
+            cases.append((cb, *row[1:]))
+    return cases
+
+async def run_case(case: Tuple[str, ...], cached: bool = False) -> str:
+    """One end-to-end verification (fetch, parse, format) -> its status (found / not_found / error / busy)."""
+    cb = case[0]
+    body = taj.CERT_BODIES.get(cb) or taj.CERT_BODIES["other"]
+    ident, extra = body.split_inputs(dict(zip(body.inputs, case[1:])))
+    res = await taj.verify_certificate(cb, ident, extra, force=not cached)
+    res.render("html")
+    return res.status
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[idx]
+
+async def bench_body(cases: List[Tuple[str, ...]], iterations: int, concurrency: int, cached: bool = False) -> Dict[str, Any]:
+    """
+    Latency percentiles and throughput cover the verifications that ran; lookups refused at once
+    because the body was busy (UpstreamBusy) are only counted, under "busy".
+    """
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = busy = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors, busy
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                status = await run_case(cases[i % len(cases)], cached)
+            except Exception:
+                status = "error"
+            if status == "busy":
+                busy += 1
+                return
+            latencies.append(time.perf_counter() - t0)
+            if status == "error":
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "requests": iterations,
+        "errors": errors,
+        "busy": busy,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+    }
+
+async def bench(cases: List[Tuple[str, ...]], iterations: int, concurrency: int, cached: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Benchmark each certification body in turn; returns {cb: stats}."""
+    by_cb: Dict[str, List[Tuple[str, ...]]] = {}
+    for c in cases:
+        by_cb.setdefault(c[0], []).append(c)
+    report = {}
+    for cb, cb_cases in by_cb.items():
+        report[cb] = await bench_body(cb_cases, iterations, concurrency, cached)
+        logger.info("bench %s: %s", cb, report[cb])
+    return report
+
+def print_report(report: Dict[str, Dict[str, Any]]) -> None:
+    cols = ["requests", "errors", "busy", "p50_ms", "p95_ms", "p99_ms", "max_ms", "throughput_rps"]
+    print(f"{'body':<10}" + "".join(f"{c:>16}" for c in cols))
+    for cb, stats in report.items():
+        print(f"{cb:<10}" + "".join(f"{stats[c]:>16}" for c in cols))
+
+# ---------------- parser benchmark ----------------
+def parse_job(fx: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """(parser, *args) for a recorded page taj.py parses, or None."""
+    if fx.get("status") != 200:
+        return None
+    text = fx["body"].encode("latin-1").decode("utf-8", "replace")
+    url = fx["url"]
+    parts = urlsplit(url)
+    if parts.hostname == "www.fssc.com" and parts.path.startswith("/public-register/"):
+        if "search=" in parts.query:
+            return (taj.parse_fssc_search_page, text)
+        coid = parts.path.rstrip("/").rsplit("/", 1)[-1]
+        return (taj.parse_fssc_detail, text, coid) if coid != "public-register" else None
+    if url.startswith(taj.QSI_BASE):
+        return (taj.parse_qsi_page, text)
+    if fx["method"] == "POST" and url in (taj.QRO_COM_VERIFY, taj.QRO_ORG_PAGE):
+        return (taj.parse_certificate_from_html, text)
+    return None
+
+def _run_job(job: Tuple[Any, ...]) -> int:
+    job[0](*job[1:])
+    return len(job[1])
+
+def parse_bench(jobs: List[Tuple[Any, ...]], pages: int, workers: List[int]) -> List[Dict[str, Any]]:
+    """Parse `pages` pages (cycling through jobs) once per worker count; 0 = inline in this process."""
+    batch = [jobs[i % len(jobs)] for i in range(pages)]
+    rows = []
+    for n in workers:
+        if n <= 0:
+            t0 = time.perf_counter()
+            for job in batch:
+                _run_job(job)
+            wall = time.perf_counter() - t0
+        else:
+            with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn")) as pool:
+                list(pool.map(_run_job, batch[:n]))   # start the workers outside the timed run
+                t0 = time.perf_counter()
+                list(pool.map(_run_job, batch, chunksize=max(1, pages // (n * 8))))
+                wall = time.perf_counter() - t0
+        rows.append({"workers": n, "pages": pages, "wall_s": round(wall, 3), "pages_per_s": round(pages / wall, 1) if wall else 0.0})
+        logger.info("parse-bench %s", rows[-1])
+    base = rows[0]["pages_per_s"] if rows else 0.0
+    for r in rows:
+        r["speedup"] = round(r["pages_per_s"] / base, 2) if base else 0.0
+    return rows
+
+# ---------------- CLI ----------------
+def cli(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Record/replay upstream responses for taj.py")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help=f"fixture directory (default: {FIXTURES_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_rec = sub.add_parser("record", help="run cases against the live sites and store the responses")
+    p_rec.add_argument("cases", help="cases CSV")
+    for name in ("serve", "bench"):
+        p = sub.add_parser(name, help="stand-in server" if name == "serve" else "offline benchmark per certification body")
+        p.add_argument("--latency", type=float, default=0.0, help="fixed delay per upstream request (s)")
+        p.add_argument("--jitter", type=float, default=0.0, help="extra uniform random delay (s)")
+        p.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+        p.add_argument("--error-status", type=int, default=503, help="status code for injected errors")
+        p.add_argument("--seed", type=int, default=None, help="random seed for jitter/errors")
+        if name == "serve":
+            p.add_argument("--port", type=int, default=8765)
+        else:
+            p.add_argument("cases", help="cases CSV")
+            p.add_argument("-n", "--iterations", type=int, default=100, help="verifications per body")
+            p.add_argument("-c", "--concurrency", type=int, default=8, help="verifications in flight")
+            p.add_argument("--cached", action="store_true", help="allow cache hits (default: always fetch)")
+            p.add_argument("--rate-limits", action="store_true", help="keep taj.py's per-host rate limits (default: lifted)")
+            p.add_argument("--json", action="store_true", help="print the report as JSON")
+    p_parse = sub.add_parser("parse-bench", help="HTML parser throughput by number of parser processes")
+    p_parse.add_argument("-n", "--pages", type=int, default=1000, help="pages parsed per worker count")
+    p_parse.add_argument("--workers", default=",".join(str(n) for n in sorted({0, 1, 2, 4, os.cpu_count() or 1})),
+                         help="comma-separated parser process counts (0 = inline)")
+    p_parse.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    store = FixtureStore(args.fixtures)
+
+    if args.command == "record":
+        store.load()
+        install_recorder(store)
+        for case in load_cases(args.cases):
+            try:
+                status = asyncio.run(run_case(case))
+            except Exception as e:
+                logger.exception("record %s failed: %s", case, e)
+                status = "error"
+            print(f"{'ok ' if status not in ('error', 'busy') else 'ERR'} {','.join(case)}")
+        print(f"{len(store._exact)} fixtures in {args.fixtures}", file=sys.stderr)
+        return
+
+    n = store.load()
+    if not n:
+        parser.error(f"no fixtures in {args.fixtures}; run 'record' first")
+    if args.command == "parse-bench":
+        jobs = [job for job in map(parse_job, store._exact.values()) if job]
+        if not jobs:
+            parser.error(f"no parseable FSSC / QSI / QRO pages in {args.fixtures}")
+        rows = parse_bench(jobs, args.pages, [int(w) for w in args.workers.split(",") if w.strip()])
+        if args.json:
+            print(json.dumps(rows, indent=2))
+        else:
+            print(f"{len(jobs)} recorded pages, {os.cpu_count()} CPUs")
+            print(f"{'workers':>8}{'pages':>8}{'wall_s':>10}{'pages/s':>10}{'speedup':>9}")
+            for r in rows:
+                print(f"{r['workers']:>8}{r['pages']:>8}{r['wall_s']:>10}{r['pages_per_s']:>10}{r['speedup']:>9}")
+        return
+    server = StandInServer(store, port=getattr(args, "port", 0), latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    if args.command == "serve":
+        logger.info("Stand-in server with %d fixtures on %s", n, server.base_url)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    server.start()
+    install_standin(server.base_url, rate_limits=args.rate_limits)
+    try:
+        report = asyncio.run(bench(load_cases(args.cases), args.iterations, args.concurrency, args.cached))
+    finally:
+        server.shutdown()
+    if args.json:
+        print(json.dumps({"bodies": report, "server": server.stats}, indent=2))
+    else:
+        print_report(report)
+        print(f"stand-in: {server.stats}")
+
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])